@@ -13,6 +13,8 @@ class Config:
     NEO4J_USERNAME: str = os.getenv("NEO4J_USERNAME", "")
     NEO4J_PASSWORD: str = os.getenv("NEO4J_PASSWORD", "")
     NEO4J_DATABASE: str = os.getenv("NEO4J_DATABASE", "neo4j")
+    # Shared by reads and the market price writer, which uses a tenth of it
+    NEO4J_MAX_CONNECTION_POOL_SIZE: int = int(os.getenv("NEO4J_MAX_CONNECTION_POOL_SIZE", "50"))
     
     # OpenAI Configuration
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
@@ -45,6 +47,14 @@ class Config:
     # File paths
     DATA_DIR: str = os.getenv("DATA_DIR", "./data")
     VECTOR_STORE_PATH: str = os.getenv("VECTOR_STORE_PATH", "./vector_store")
+    
+    # Voice backends ("none" disables): speech-to-text "google" (SpeechRecognition), text-to-speech "gtts"
+    STT_BACKEND: str = os.getenv("STT_BACKEND", "google")
+    TTS_BACKEND: str = os.getenv("TTS_BACKEND", "gtts")
+    
+    # Text-to-speech cache (synthesized MP3s keyed by language and text)
+    TTS_CACHE_DIR: str = os.getenv("TTS_CACHE_DIR", "./tts_cache")
+    TTS_CACHE_MAX_MB: int = int(os.getenv("TTS_CACHE_MAX_MB", "100"))
 
     # Market Prices (Agmarknet)
     AGMARKNET_API_BASE: str = os.getenv(
@@ -8,6 +8,7 @@ import pandas as pd
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 import joblib
+from xgboost import XGBClassifier
 from data_loader import FertilizerDataLoader
 from kg_integration import FertilizerKGIntegration
 from config import config
@@ -26,6 +27,7 @@ class FertilizerService:
         self.kg_integration = FertilizerKGIntegration()
         self.model_version = "1.0"
         self.model_loaded = False
+        self.feature_dtype = "float64"  # Models saved before float32 training expect float64
         
         # Try to load model
         self.load_model()
@@ -33,6 +35,33 @@ class FertilizerService:
     def load_model(self) -> bool:
         """Load trained XGBoost model"""
         try:
+            # Current layout: native UBJSON model plus one lz4-compressed preprocessor bundle
+            bundle_path = self.model_dir / "fertilizer_bundle.joblib"
+            if bundle_path.exists():
+                bundle = joblib.load(bundle_path)
+                ubj_path = self.model_dir / "fertilizer_model.ubj"
+                if ubj_path.exists():
+                    self.model = XGBClassifier()
+                    self.model.load_model(ubj_path)
+                else:
+                    # Bundles written before the UBJ format carry the pickled model
+                    self.model = bundle["model"]
+                self.data_loader.label_encoders = bundle["label_encoders"]
+                self.data_loader.target_encoder = bundle["target_encoder"]
+                self.data_loader.scaler = bundle["scaler"]
+                self.data_loader.feature_columns = bundle["feature_columns"]
+                self.feature_dtype = bundle.get("feature_dtype", "float64")
+                if self.data_loader.target_encoder is not None:
+                    self.data_loader.class_names = self.data_loader.target_encoder.classes_
+                    logger.info(f"Target encoder loaded. Fertilizer classes: {self.data_loader.class_names}")
+                else:
+                    logger.warning("Target encoder not found. Predictions may use numeric classes.")
+                
+                self.model_loaded = True
+                logger.info(f"Fertilizer ML model loaded from bundle: {bundle_path}")
+                return True
+            
+            # Legacy layout: separate pickles per object
             model_path = self.model_dir / "fertilizer_model.pkl"
             if not model_path.exists():
                 logger.warning(f"Model file not found: {model_path}. Run train_model.py first.")
@@ -160,7 +189,7 @@ class FertilizerService:
                 feature_array = base_feature_array
             
             # Get predictions with probabilities
-            probabilities = self.model.predict_proba(feature_array)[0]
+            probabilities = self.model.predict_proba(feature_array.astype(self.feature_dtype, copy=False))[0]
             class_indices = np.argsort(probabilities)[::-1][:top_k]
             
             # Decode fertilizer names from encoded classes
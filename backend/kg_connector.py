@@ -2,13 +2,25 @@ import logging
 import pandas as pd
 import requests
 from neo4j import GraphDatabase
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import os
 from config import config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Labels batch_search may interpolate into a MATCH pattern, with their per-name result limit
+# (fertilizer and pesticide lookups keep the LIMIT 50 of search_fertilizers_pesticides)
+_BATCH_SEARCH_LIMITS = {
+    "Crop": 20,
+    "Pest": 20,
+    "Disease": 20,
+    "Region": 20,
+    "Controlmethod": 20,
+    "Fertilizer": 50,
+    "Pesticide": 50,
+}
+
 class Neo4jConnector:
     def __init__(self):
         self.driver = None
@@ -25,7 +37,7 @@ class Neo4jConnector:
                 auth=(config.NEO4J_USERNAME, config.NEO4J_PASSWORD),
                 connection_timeout=30,
                 max_connection_lifetime=600,
-                max_connection_pool_size=50
+                max_connection_pool_size=config.NEO4J_MAX_CONNECTION_POOL_SIZE
                 # Don't specify encrypted=True as it's already in the URI scheme
             )
             
@@ -56,6 +68,30 @@ class Neo4jConnector:
         if self.driver:
             self.driver.close()
     
+    def warmup(self):
+        """Touch every node and relationship so the first user queries hit a warm page cache"""
+        if not self.driver:
+            return
+        try:
+            with self.driver.session(database=config.NEO4J_DATABASE) as session:
+                try:
+                    # APOC loads the whole store into the page cache when available
+                    session.run("CALL apoc.warmup.run()").consume()
+                    logger.info("Neo4j page cache warmed with apoc.warmup.run()")
+                    return
+                except Exception:
+                    pass
+                
+                query = """
+                MATCH (n)
+                OPTIONAL MATCH (n)-[r]->()
+                RETURN count(n.name) + count(r.type) AS touched
+                """
+                touched = session.run(query).single()["touched"]
+                logger.info(f"Neo4j page cache warmed ({touched} properties touched)")
+        except Exception as e:
+            logger.warning(f"Neo4j warmup failed: {e}")
+    
     def auto_load_data(self):
         """Automatically load data if database is empty"""
         try:
@@ -228,6 +264,65 @@ class Neo4jConnector:
             logger.error(f"Error searching entities: {e}")
             return []
     
+    def batch_search(self, pairs: List[Tuple[str, str]]) -> List[List[Dict]]:
+        """Search several (label, name) pairs in one round-trip; results are aligned with pairs"""
+        results = [[] for _ in pairs]
+        
+        # One UNION ALL branch per label so each search stays a label scan
+        by_label: Dict[str, List[Dict[str, Any]]] = {}
+        for i, (label, name) in enumerate(pairs):
+            label = label.title()
+            if label not in _BATCH_SEARCH_LIMITS:
+                logger.warning(f"Skipping search for unknown entity label {label}")
+                continue
+            by_label.setdefault(label, []).append({"idx": i, "name": name})
+        if not by_label:
+            return results
+        
+        try:
+            with self.driver.session(database=config.NEO4J_DATABASE) as session:
+                query = "\nUNION ALL\n".join(f"""
+                UNWIND $pairs_{label} AS p
+                CALL {{
+                    WITH p
+                    MATCH (n:{label})
+                    WHERE toLower(n.name) CONTAINS toLower(p.name)
+                    RETURN n
+                    LIMIT {_BATCH_SEARCH_LIMITS[label]}
+                }}
+                RETURN p.idx AS idx, labels(n)[0] AS type, n
+                """ for label in by_label)
+                records = session.run(
+                    query,
+                    **{f"pairs_{label}": label_pairs for label, label_pairs in by_label.items()}
+                )
+                
+                for record in records:
+                    node = dict(record["n"])
+                    if pairs[record["idx"]][0] in ("Fertilizer", "Pesticide"):
+                        node["product_type"] = record["type"]
+                    results[record["idx"]].append(node)
+                
+                return results
+        except Exception as e:
+            logger.error(f"Error in batch entity search: {e}")
+            return [[] for _ in pairs]
+    
+    def all_entity_names(self) -> List[Tuple[str, str]]:
+        """Get (label, name) for every named node in the knowledge graph"""
+        try:
+            with self.driver.session(database=config.NEO4J_DATABASE) as session:
+                query = """
+                MATCH (n)
+                WHERE n.name IS NOT NULL
+                RETURN labels(n)[0] AS label, n.name AS name
+                """
+                records = session.run(query)
+                return [(record["label"], str(record["name"])) for record in records]
+        except Exception as e:
+            logger.error(f"Error getting entity names: {e}")
+            return []
+    
     def get_related_entities(self, entity_name: str, relationship_type: str = None) -> Dict[str, List[Dict]]:
         """Get entities related to a specific entity"""
         try:
@@ -86,7 +86,7 @@ class FertilizerKGIntegration:
                 RETURN f
                 """
                 session.run(query, name=fertilizer_name, properties=default_props)
-                logger.debug(f"Upserted fertilizer node: {fertilizer_name}")
+                logger.debug("Upserted fertilizer node: %s", fertilizer_name)
                 return True
         
         except Exception as e:
@@ -114,7 +114,7 @@ class FertilizerKGIntegration:
                 RETURN c
                 """
                 session.run(query, name=crop_name, properties=default_props)
-                logger.debug(f"Upserted crop node: {crop_name}")
+                logger.debug("Upserted crop node: %s", crop_name)
                 return True
         
         except Exception as e:
@@ -169,7 +169,7 @@ class FertilizerKGIntegration:
                 RETURN r
                 """
                 session.run(query, crop_name=crop_name, fertilizer_name=fertilizer_name, properties=rel_props)
-                logger.debug(f"Created SUITABLE_FOR relationship: {crop_name} -> {fertilizer_name} (score: {score})")
+                logger.debug("Created SUITABLE_FOR relationship: %s -> %s (score: %s)", crop_name, fertilizer_name, score)
                 return True
         
         except Exception as e:
@@ -2,13 +2,61 @@ import asyncio
 import aiohttp
 import logging
 from typing import Dict, List, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import requests
+from neo4j import RoutingControl
 from config import config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Mark old weather records for a region as not current
+_WEATHER_MARK_OLD_QUERY = """
+MATCH (w:LiveWeatherData)
+WHERE w.region = $region
+SET w.is_current = false
+"""
+
+# Upsert a batch of market price rows. Each row upserts its commodity+market+date
+# record and marks every other date for the same commodity+market as not current;
+# the subquery runs once per row so later rows see the writes of earlier ones.
+_MARKET_PRICE_UPSERT_QUERY = """
+UNWIND $rows AS row
+CALL {
+    WITH row
+    MERGE (m:LiveMarketPrice {commodity: row.commodity, market: row.market, date: row.date})
+    SET m.variety = row.variety,
+        m.price = row.price,
+        m.unit = row.unit,
+        m.district = row.district,
+        m.state = row.state,
+        m.timestamp = row.timestamp,
+        m.is_current = true
+    WITH m, row
+    MATCH (o:LiveMarketPrice {commodity: row.commodity, market: row.market})
+    WHERE o.date <> row.date
+    SET o.is_current = false
+}
+"""
+
+def price_date_key(price_data: Dict[str, Any]) -> datetime:
+    """Sort key for a price row's date: Agmarknet DD/MM/YYYY or our ISO fallback"""
+    value = price_data.get("date") or ""
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return datetime.min
+
+# Dedicated threads for concurrent market price writes; each holds one pooled
+# Neo4j connection, so writes use at most a tenth of the pool and reads keep the rest
+_kg_write_executor = ThreadPoolExecutor(
+    max_workers=max(1, config.NEO4J_MAX_CONNECTION_POOL_SIZE // 10),
+    thread_name_prefix="kg-write"
+)
+
 class LiveDataService:
     def __init__(self):
         self.indian_weather_api_key = config.INDIAN_WEATHER_API_KEY
@@ -624,12 +672,7 @@ class LiveDataService:
                     timestamp = weather_data.get("timestamp", datetime.now().isoformat())
                     
                     # Mark old records for this region as not current
-                    mark_old_query = """
-                    MATCH (w:LiveWeatherData)
-                    WHERE w.region = $region
-                    SET w.is_current = false
-                    """
-                    session.run(mark_old_query, region=region)
+                    session.run(_WEATHER_MARK_OLD_QUERY, region=region)
                     
                     # Create new current record
                     create_query = """
@@ -664,12 +707,48 @@ class LiveDataService:
                     """
                     session.run(cleanup_query)
                     
-                    logger.debug(f"Updated weather data in KG for {region} (with historical tracking)")
+                    logger.debug("Updated weather data in KG for %s (with historical tracking)", region)
             else:
                 logger.warning("Neo4j not available, skipping weather update in KG")
         except Exception as e:
             logger.error(f"Error updating weather data in KG: {e}")
     
+    def _write_market_price_group(self, rows: List[Dict[str, Any]]):
+        """Upsert all rows of one commodity+market group in a single query"""
+        from kg_connector import neo4j_connector
+        # Process dates oldest first so the latest one ends up current
+        rows = sorted(rows, key=price_date_key)
+        neo4j_connector.driver.execute_query(
+            _MARKET_PRICE_UPSERT_QUERY,
+            rows=[{
+                "commodity": price_data.get("commodity"),
+                "market": price_data.get("market"),
+                "date": price_data.get("date"),
+                "variety": price_data.get("variety"),
+                "price": price_data.get("price"),
+                "unit": price_data.get("unit"),
+                "district": price_data.get("district"),
+                "state": price_data.get("state"),
+                "timestamp": price_data.get("timestamp"),
+            } for price_data in rows],
+            database_=config.NEO4J_DATABASE,
+            routing_=RoutingControl.WRITE
+        )
+    
+    def warm_query_plans(self):
+        """Run the live data write queries once with no-op parameters so their plans are cached"""
+        from kg_connector import neo4j_connector
+        if not neo4j_connector.driver:
+            return
+        neo4j_connector.driver.execute_query(
+            _MARKET_PRICE_UPSERT_QUERY, rows=[],
+            database_=config.NEO4J_DATABASE, routing_=RoutingControl.WRITE
+        )
+        neo4j_connector.driver.execute_query(
+            _WEATHER_MARK_OLD_QUERY, region="",
+            database_=config.NEO4J_DATABASE, routing_=RoutingControl.WRITE
+        )
+    
     async def _update_market_prices_in_kg(self, market_data: List[Dict[str, Any]]):
         """Update market prices in the knowledge graph with historical tracking"""
         try:
@@ -677,92 +756,22 @@ class LiveDataService:
             try:
                 from kg_connector import neo4j_connector
                 if neo4j_connector.driver:
+                    # Rows of different commodity+market pairs never touch the same
+                    # nodes, so each group is written concurrently in its own session
+                    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+                    for price_data in market_data:
+                        key = (price_data.get("commodity"), price_data.get("market"))
+                        groups.setdefault(key, []).append(price_data)
+                    
+                    # Writes run on their own small pool so the hourly refresh can't
+                    # take over the default executor that KG reads and speech calls use
+                    loop = asyncio.get_running_loop()
+                    await asyncio.gather(*(
+                        loop.run_in_executor(_kg_write_executor, self._write_market_price_group, rows)
+                        for rows in groups.values()
+                    ))
+                    
                     with neo4j_connector.driver.session(database=config.NEO4J_DATABASE) as session:
-                        for price_data in market_data:
-                            commodity = price_data.get("commodity")
-                            market = price_data.get("market")
-                            date = price_data.get("date")
-                            
-                            # Check if a record with same commodity+market+date exists
-                            check_query = """
-                            MATCH (m:LiveMarketPrice)
-                            WHERE m.commodity = $commodity 
-                              AND m.market = $market 
-                              AND m.date = $date
-                            RETURN m.timestamp as existing_timestamp
-                            LIMIT 1
-                            """
-                            result = session.run(check_query, 
-                                                commodity=commodity,
-                                                market=market,
-                                                date=date)
-                            existing = result.single()
-                            
-                            if existing:
-                                # Update existing record (same day update)
-                                update_query = """
-                                MATCH (m:LiveMarketPrice)
-                                WHERE m.commodity = $commodity 
-                                  AND m.market = $market 
-                                  AND m.date = $date
-                                SET m.variety = $variety,
-                                    m.price = $price,
-                                    m.unit = $unit,
-                                    m.district = $district,
-                                    m.state = $state,
-                                    m.timestamp = $timestamp,
-                                    m.is_current = true
-                                RETURN m
-                                """
-                                session.run(update_query,
-                                           commodity=commodity,
-                                           market=market,
-                                           date=date,
-                                           variety=price_data.get("variety"),
-                                           price=price_data.get("price"),
-                                           unit=price_data.get("unit"),
-                                           district=price_data.get("district"),
-                                           state=price_data.get("state"),
-                                           timestamp=price_data.get("timestamp"))
-                            else:
-                                # Mark old records as not current (for same commodity+market)
-                                mark_old_query = """
-                                MATCH (m:LiveMarketPrice)
-                                WHERE m.commodity = $commodity 
-                                  AND m.market = $market
-                                SET m.is_current = false
-                                """
-                                session.run(mark_old_query,
-                                          commodity=commodity,
-                                          market=market)
-                                
-                                # Create new record
-                                create_query = """
-                                CREATE (m:LiveMarketPrice {
-                                    commodity: $commodity,
-                                    market: $market,
-                                    date: $date,
-                                    variety: $variety,
-                                    price: $price,
-                                    unit: $unit,
-                                    district: $district,
-                                    state: $state,
-                                    timestamp: $timestamp,
-                                    is_current: true
-                                })
-                                RETURN m
-                                """
-                                session.run(create_query,
-                                          commodity=commodity,
-                                          market=market,
-                                          date=date,
-                                          variety=price_data.get("variety"),
-                                          price=price_data.get("price"),
-                                          unit=price_data.get("unit"),
-                                          district=price_data.get("district"),
-                                          state=price_data.get("state"),
-                                          timestamp=price_data.get("timestamp"))
-                        
                         # Clean up old records (keep last 30 days)
                         cleanup_query = """
                         MATCH (m:LiveMarketPrice)
@@ -771,7 +780,7 @@ class LiveDataService:
                         """
                         session.run(cleanup_query)
                     
-                    logger.debug(f"Updated {len(market_data)} market price records in KG (with historical tracking)")
+                    logger.debug("Updated %d market price records in KG (with historical tracking)", len(market_data))
                 else:
                     logger.warning("Neo4j not available, skipping market price update in KG")
             except Exception as e:
@@ -1,18 +1,20 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form, BackgroundTasks
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
 from typing import Dict, List, Any, Optional
 import logging
+import json
 import uvicorn
 import io
 import asyncio
-import os
+import time
 from datetime import datetime
+from neo4j import RoutingControl
 from config import config
 from kg_connector import neo4j_connector
 from ragpipeline import rag_pipeline
-from voice_handler import voice_handler
+from voice_handler import get_voice_handler, close_voice_handler
 from live_data_service import live_data_service
 from fertilizer_service import fertilizer_service
 
@@ -61,10 +63,41 @@ class RecommendationRequest(BaseModel):
     temperature: float
     humidity: Optional[float] = None
 
+# Read queries served by the graph and status endpoints
+NEIGHBORS_QUERY = (
+    "MATCH (a {name: $name})-[r]-(b) "
+    "RETURN labels(a) AS a_labels, a AS a_node, labels(b) AS b_labels, b AS b_node, type(r) AS rel "
+    "LIMIT $limit"
+)
+STATUS_QUERY = "RETURN 1"
+
+def warm_query_plans():
+    """Run the hot Cypher queries once so their plans are cached before the first request"""
+    try:
+        if not neo4j_connector.driver:
+            return
+        live_data_service.warm_query_plans()
+        neo4j_connector.driver.execute_query(
+            NEIGHBORS_QUERY, name="", limit=1,
+            database_=config.NEO4J_DATABASE, routing_=RoutingControl.READ
+        )
+        neo4j_connector.driver.execute_query(
+            STATUS_QUERY, database_=config.NEO4J_DATABASE, routing_=RoutingControl.READ
+        )
+        neo4j_connector.get_sample_nodes(limit=20)
+        neo4j_connector.get_sample_relationships(limit=30)
+        logger.info("Neo4j query plans warmed")
+    except Exception as e:
+        logger.warning(f"Query plan warmup failed: {e}")
+
+# Background Neo4j page cache warmup, kept so it isn't garbage-collected mid-run
+_warmup_task: Optional[asyncio.Task] = None
+
 # Startup event
 @app.on_event("startup")
 async def startup_event():
     """Initialize components on startup"""
+    global _warmup_task
     try:
         if not config.validate_config():
             logger.error("Configuration validation failed")
@@ -73,6 +106,12 @@ async def startup_event():
         # Auto-load data if database is empty
         neo4j_connector.auto_load_data()
         
+        # Warm the Neo4j page cache in the background; requests are served meanwhile
+        _warmup_task = asyncio.create_task(asyncio.to_thread(neo4j_connector.warmup))
+        
+        # Compile the production queries before serving traffic
+        await asyncio.to_thread(warm_query_plans)
+        
         # Note: Fertilizer ML model should be trained first using train_model.py
         # The model will be loaded automatically by fertilizer_service on first use
         
@@ -84,15 +123,44 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Startup error: {e}")
 
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled connections on shutdown"""
+    try:
+        # Stop waiting on an unfinished warmup (its thread finishes on its own) and collect its result
+        if _warmup_task is not None:
+            _warmup_task.cancel()
+            try:
+                await _warmup_task
+            except asyncio.CancelledError:
+                pass
+        
+        await rag_pipeline.aclose()
+        await close_voice_handler()
+    except Exception as e:
+        logger.error(f"Shutdown error: {e}")
+
+LIVE_DATA_UPDATE_INTERVAL = 3600  # Update every hour
+
 async def start_live_data_updates():
-    """Start periodic live data updates"""
+    """Start periodic live data updates on a fixed hourly schedule"""
+    # Schedule against the monotonic clock so update duration doesn't shift the cadence
+    next_run = time.monotonic()
     while True:
         try:
             await live_data_service.update_knowledge_graph_with_live_data()
-            await asyncio.sleep(3600)  # Update every hour
         except Exception as e:
             logger.error(f"Live data update error: {e}")
             await asyncio.sleep(300)  # Retry after 5 minutes on error
+            continue
+        
+        next_run += LIVE_DATA_UPDATE_INTERVAL
+        now = time.monotonic()
+        # Skip slots missed by an overrunning update instead of running back-to-back
+        while next_run <= now:
+            next_run += LIVE_DATA_UPDATE_INTERVAL
+        await asyncio.sleep(next_run - now)
 
 # Health check endpoint
 @app.get("/")
@@ -142,6 +210,46 @@ async def process_query(request: QueryRequest):
         logger.error(f"Error processing query: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+def _sse_event(data: str, event: Optional[str] = None) -> str:
+    """Format one Server-Sent Events message"""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+# Streaming query endpoint (Server-Sent Events)
+@app.post("/query/stream")
+async def process_query_stream(request: QueryRequest):
+    """Process agricultural query and stream the answer as Server-Sent Events
+    
+    Sends a "metadata" event with sources/entities/intent first, then the answer
+    text in data events as it is generated, and finally a "done" event.
+    """
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    
+    try:
+        result = await rag_pipeline.process_multilingual_query(
+            request.query, request.language, stream=True
+        )
+    except Exception as e:
+        logger.error(f"Error processing streaming query: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+    
+    answer = result.pop("response")
+    
+    async def event_stream():
+        yield _sse_event(json.dumps(result, default=str, ensure_ascii=False), event="metadata")
+        if isinstance(answer, str):
+            # Pipeline errors come back as a complete message
+            yield _sse_event(answer)
+        else:
+            async for delta in answer:
+                yield _sse_event(delta)
+        yield _sse_event("", event="done")
+        logger.info(f"Streamed query: {request.query[:50]}...")
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 # Voice query endpoint
 @app.post("/voice-query")
 async def process_voice_query(
@@ -180,23 +288,18 @@ async def process_voice_query(
 async def text_to_speech(request: TTSRequest):
     """Convert text to speech using gTTS"""
     try:
-        # Generate speech file
-        audio_file_path = await voice_handler.text_to_speech(
+        # Generate speech audio
+        audio = await get_voice_handler().text_to_speech(
             request.text, request.language
         )
         
-        if not audio_file_path:
+        if not audio:
             raise HTTPException(status_code=500, detail="Failed to generate speech")
         
-        # Return the audio file with cleanup
-        background_tasks = BackgroundTasks()
-        background_tasks.add_task(os.remove, audio_file_path)
-        
-        return FileResponse(
-            path=audio_file_path,
+        return Response(
+            content=audio,
             media_type="audio/mpeg",
-            filename="response.mp3",
-            background=background_tasks
+            headers={"Content-Disposition": 'attachment; filename="response.mp3"'}
         )
         
     except Exception as e:
@@ -222,17 +325,14 @@ async def get_weather_data_by_gps(latitude: float, longitude: float):
             closest_city = None
             min_distance = float('inf')
             
-            logger.debug(f"Finding closest city for coordinates: ({latitude}, {longitude})")
-            
             for city_name, (city_lat, city_lon) in config.WEATHER_CITIES.items():
                 # Calculate distance (simplified)
                 distance = ((latitude - city_lat) ** 2 + (longitude - city_lon) ** 2) ** 0.5
-                logger.debug(f"Distance from ({latitude}, {longitude}) to {city_name} ({city_lat}, {city_lon}): {distance}")
                 if distance < min_distance:
                     min_distance = distance
                     closest_city = city_name
             
-            logger.debug(f"Closest city found: {closest_city} with distance {min_distance}")
+            logger.debug("Closest city found: %s with distance %s", closest_city, min_distance)
             
             if closest_city:
                 weather_data = await live_data_service.fetch_weather_data(closest_city)
@@ -291,8 +391,8 @@ async def update_live_data():
 async def get_supported_languages():
     """Get list of supported languages (handled by Llama 3.1 8B)"""
     return {
-        "stt_languages": voice_handler.get_supported_languages(),
-        "tts_languages": voice_handler.get_supported_languages(),
+        "stt_languages": get_voice_handler().get_supported_languages(),
+        "tts_languages": get_voice_handler().get_supported_languages(),
         "llm_languages": ["en", "hi", "ta", "te", "bn", "gu", "kn", "ml"]  # Languages supported by Llama 3.1 8B
     }
 
@@ -373,38 +473,35 @@ async def get_graph_neighbors(name: str, limit: int = 24):
         links: List[Dict[str, Any]] = []
         # Also exclude Live* per request
         exclude_labels = {"WeatherData", "MarketPrice", "LiveMarketPrice", "LiveWeatherData"}
-        with neo4j_connector.driver.session(database=config.NEO4J_DATABASE) as session:
-            query = (
-                "MATCH (a {name: $name})-[r]-(b) "
-                "RETURN labels(a) AS a_labels, a AS a_node, labels(b) AS b_labels, b AS b_node, type(r) AS rel "
-                "LIMIT $limit"
-            )
-            records = session.run(query, name=name, limit=limit)
-            for rec in records:
-                a_node = dict(rec["a_node"])  # type: ignore
-                b_node = dict(rec["b_node"])  # type: ignore
-                a_labels = rec["a_labels"]
-                b_labels = rec["b_labels"]
-                rel = rec["rel"]
-
-                def add_node(n: Dict[str, Any], labels: List[str]):
-                    node_name = n.get("name") or "Unknown"
-                    node_type = (labels[0] if labels else "Node")
-                    if node_type in exclude_labels:
-                        return None
-                    if node_name not in nodes_map:
-                        nodes_map[node_name] = {
-                            "id": node_name,
-                            "name": node_name,
-                            "type": node_type.lower(),
-                            "properties": {k: v for k, v in n.items() if k not in ["id", "name"]},
-                        }
-                    return node_name
-
-                src = add_node(a_node, a_labels)
-                dst = add_node(b_node, b_labels)
-                if src and dst:
-                    links.append({"source": src, "target": dst, "relationship": rel})
+        records, _, _ = neo4j_connector.driver.execute_query(
+            NEIGHBORS_QUERY, name=name, limit=limit,
+            database_=config.NEO4J_DATABASE, routing_=RoutingControl.READ
+        )
+        for rec in records:
+            a_node = dict(rec["a_node"])  # type: ignore
+            b_node = dict(rec["b_node"])  # type: ignore
+            a_labels = rec["a_labels"]
+            b_labels = rec["b_labels"]
+            rel = rec["rel"]
+
+            def add_node(n: Dict[str, Any], labels: List[str]):
+                node_name = n.get("name") or "Unknown"
+                node_type = (labels[0] if labels else "Node")
+                if node_type in exclude_labels:
+                    return None
+                if node_name not in nodes_map:
+                    nodes_map[node_name] = {
+                        "id": node_name,
+                        "name": node_name,
+                        "type": node_type.lower(),
+                        "properties": {k: v for k, v in n.items() if k not in ["id", "name"]},
+                    }
+                return node_name
+
+            src = add_node(a_node, a_labels)
+            dst = add_node(b_node, b_labels)
+            if src and dst:
+                links.append({"source": src, "target": dst, "relationship": rel})
 
         return {"nodes": list(nodes_map.values()), "links": links}
     except Exception as e:
@@ -419,8 +516,9 @@ async def get_system_status():
         # Check Neo4j connection
         neo4j_status = "connected"
         try:
-            with neo4j_connector.driver.session(database=config.NEO4J_DATABASE) as session:
-                session.run("RETURN 1")
+            neo4j_connector.driver.execute_query(
+                STATUS_QUERY, database_=config.NEO4J_DATABASE, routing_=RoutingControl.READ
+            )
         except:
             neo4j_status = "disconnected"
         
@@ -1,17 +1,309 @@
 import logging
 import asyncio
-from typing import Dict, List, Any, Optional
-import json
+import heapq
+import re
+import threading
+import time
+from typing import Dict, List, Any, AsyncIterator, Optional, Tuple
+import orjson
+import httpx
 from datetime import datetime
-from groq import Groq
+from cachetools import LRUCache, TTLCache
+from groq import AsyncGroq
 from config import config
 from kg_connector import neo4j_connector
-from voice_handler import voice_handler
-from live_data_service import live_data_service
+from voice_handler import get_voice_handler
+from live_data_service import live_data_service, price_date_key
+
+# HTTP/2 for the Groq client needs the h2 package (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+    logging.warning("h2 not available, Groq requests will use HTTP/1.1")
+
+# Try to import pyahocorasick for the entity prefilter
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+    logging.warning("pyahocorasick not available, entity prefilter will use a regex")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Leading ```json / ``` and trailing ``` fences around LLM JSON output
+_FENCE_RE = re.compile(r'^```(?:json)?\s*|\s*```\s*$')
+
+# Unicode blocks used to detect the query language
+_TAMIL_RE = re.compile(r'[\u0B80-\u0BFF]')
+_INDIC_RE = re.compile(r'[\u0900-\u097F\u0B80-\u0BFF]')  # Devanagari or Tamil
+
+def _detect_language(query: str) -> str:
+    """Detect "ta", "hi" or "en" from the query script; Tamil wins in mixed-script text"""
+    if query.isascii():
+        return "en"
+    match = _INDIC_RE.search(query)
+    if not match:
+        return "en"
+    if match.group() >= '\u0B80' or _TAMIL_RE.search(query, match.end()):
+        return "ta"
+    return "hi"
+
+# Agricultural keywords; a query containing any of them, or any known KG
+# entity, is always sent to Groq for full extraction
+_AGRI_KEYWORDS = frozenset({
+    "price", "prices", "rate", "rates", "mandi", "market", "sell", "weather", "rain",
+    "rainfall", "temperature", "forecast", "humidity", "disease", "diseases", "symptom",
+    "symptoms", "spots", "yellow", "wilting", "rot", "blight", "leaf", "leaves", "pest",
+    "pests", "insect", "insects", "worm", "worms", "fertilizer", "fertiliser", "urea",
+    "npk", "manure", "compost", "treat", "treatment", "cure", "spray", "pesticide",
+    "control", "crop", "crops", "soil", "seed", "seeds", "sow", "sowing", "harvest",
+    "irrigation",
+})
+_AGRI_KEYWORDS_RE = re.compile(r"\b(?:" + "|".join(map(re.escape, sorted(_AGRI_KEYWORDS))) + r")\b")
+
+# How long the entity-name prefilter is used before it is rebuilt from the KG
+_ENTITY_MATCHER_TTL = 3600
+# How long to wait before retrying when the KG returned no names
+_ENTITY_MATCHER_RETRY = 60
+
+def _has_agri_keyword(query: str) -> bool:
+    """Whether a lower-cased query contains any agricultural keyword"""
+    return _AGRI_KEYWORDS_RE.search(query) is not None
+
+class EntityMatcher:
+    """Finds known KG entity names (whole words) in a lower-cased query"""
+    
+    def __init__(self, names: List[str]):
+        unique = {name.strip().lower() for name in names if name and name.strip()}
+        self.size = len(unique)
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for name in unique:
+                self._automaton.add_word(name, len(name))
+            if unique:
+                self._automaton.make_automaton()
+            self._regex = None
+        else:
+            self._automaton = None
+            # Longest names first so the alternation prefers full multi-word names
+            alternation = "|".join(map(re.escape, sorted(unique, key=len, reverse=True)))
+            self._regex = re.compile(r"(?<!\w)(?:" + alternation + r")(?!\w)") if unique else None
+    
+    def has_match(self, text: str) -> bool:
+        if not self.size:
+            return False
+        if self._automaton is None:
+            return self._regex.search(text) is not None
+        for end, length in self._automaton.iter(text):
+            start = end - length + 1
+            if (start == 0 or not text[start - 1].isalnum()) and \
+                    (end + 1 == len(text) or not text[end + 1].isalnum()):
+                return True
+        return False
+
+# Node properties most useful to the answer, in priority order; the RAG prompt
+# carries at most _MAX_PROMPT_PROPS properties per KG node
+_RELEVANT_PROPS = ("symptoms", "control", "season", "region", "impact", "dose")
+_MAX_PROMPT_PROPS = 5
+# Never sent to the LLM: the name (already on the line) and the bookkeeping kg_integration stamps on upserted nodes
+_SKIP_PROPS = ("name", "last_updated", "source")
+
+def _top_props(node: Dict[str, Any], limit: int = _MAX_PROMPT_PROPS) -> List[str]:
+    """Pick up to `limit` non-null property keys of a KG node, most relevant first"""
+    keys = [k for k in _RELEVANT_PROPS if node.get(k) is not None]
+    for k, v in node.items():
+        if len(keys) >= limit:
+            break
+        if k not in _SKIP_PROPS and v is not None and k not in _RELEVANT_PROPS:
+            keys.append(k)
+    return keys[:limit]
+
+# JSON shape interpret() asks Groq to produce for each query
+_EXTRACTION_SCHEMA = """{
+  "entities": {
+    "crop": "crop name if mentioned, else null",
+    "pests": ["list of pest names if mentioned, else empty array"],
+    "diseases": ["list of disease names if mentioned, else empty array"],
+    "symptoms": ["list of symptoms if mentioned, else empty array"],
+    "region": "region/state/city if mentioned, else null",
+    "fertilizer": "fertilizer name if mentioned, else null",
+    "pesticide": "pesticide name if mentioned, else null",
+    "treatment": "treatment method if mentioned, else null"
+  },
+  "intent": "one of: weather, market, diagnosis, treatment, advisory, fertilizer_recommendation, pest_control, disease_management, or general"
+}"""
+
+# Groq model and system messages are fixed for the life of the process
+_MODEL = config.GROQ_MODEL
+_LANG_NAME = {"ta": "Tamil", "hi": "Hindi", "en": "English"}
+_SYSTEM_EXTRACT = {"role": "system", "content": "You are a precise JSON extraction system. Always return valid JSON only."}
+_SYSTEM_GEN = {"role": "system", "content": "You are Prakriti, an expert agricultural advisor for Indian farmers. Provide practical, actionable advice in the farmer's language. Structure your response clearly using markdown formatting with paragraphs, bullet points, and bold text where appropriate."}
+_SYSTEM_FALLBACK = {"role": "system", "content": "You are Prakriti, an expert agricultural advisor for Indian farmers."}
+_SYSTEM_LAST_RESORT = {"role": "system", "content": "You are Prakriti, an agricultural advisor. Structure your response clearly using markdown formatting with paragraphs, bullet points, and bold text where appropriate."}
+
+# Prompt templates are built once at import; %(name)s placeholders are filled per call
+# (%-formatting leaves the JSON braces in the templates alone)
+_INTERPRET_PROMPT = """You are an agricultural entity extraction system. Extract structured information from this farmer's query.
+
+Farmer's Query: "%(query)s"
+
+Extract the following information and return ONLY valid JSON (no markdown, no explanation):
+""" + _EXTRACTION_SCHEMA + """
+
+Important:
+- Return ONLY the JSON object, no other text
+- Use null for missing values, empty arrays [] for missing lists
+- For intent, choose the most specific one that matches the query
+- Preserve original language terms (Tamil, Hindi, English) in the entities"""
+
+_INTERPRET_BATCH_PROMPT = """You are an agricultural entity extraction system. Extract structured information from each of these farmer's queries.
+
+Farmer's Queries:
+%(queries)s
+
+For EACH query, in the same order, extract the following information and return ONLY a valid JSON array of %(count)d objects (no markdown, no explanation), each shaped like:
+""" + _EXTRACTION_SCHEMA + """
+
+Important:
+- Return ONLY the JSON array, exactly one object per query, no other text
+- Use null for missing values, empty arrays [] for missing lists
+- For intent, choose the most specific one that matches the query
+- Preserve original language terms (Tamil, Hindi, English) in the entities"""
+
+_INTERPRET_RETRY_PROMPT = """Extract entities from: "%(query)s". Return JSON: {"entities": {"crop": null, "pests": [], "diseases": [], "region": null}, "intent": "general"}"""
+
+_GEN_PROMPT = """You are Prakriti, an AI agricultural advisor specializing in Indian agriculture.
+
+Farmer's Question: "%(query)s"
+
+Context from Knowledge Graph:
+%(kg_context)s
+%(live_context)s
+
+Instructions:
+1. Answer the farmer's question using the provided context if available
+2. If context is available, use it to provide accurate, specific advice
+3. If context is limited or unavailable, provide helpful agricultural advice based on your knowledge of Indian agriculture
+4. Answer in the SAME LANGUAGE as the farmer's question (%(language)s)
+5. Be practical, actionable, and specific to Indian farming conditions
+6. If discussing crops, pests, or diseases, mention specific regions when relevant
+7. Structure your response clearly using markdown formatting:
+   - Use paragraphs separated by blank lines
+   - Use bullet points or numbered lists for multiple items
+   - Use **bold** for important terms or headings
+8. Keep the response concise (2-4 sentences per paragraph) but informative
+9. If you don't have specific data (e.g., current market prices), provide general guidance based on your knowledge
+
+Response:"""
+
+_FALLBACK_PROMPT = """You are Prakriti, an AI agricultural advisor for Indian farmers.
+
+Farmer's Question: "%(query)s"
+
+%(context)sPlease provide a helpful response based on your knowledge of Indian agriculture. If you don't have specific information, provide general agricultural advice.
+
+Structure your response clearly using markdown formatting:
+- Use paragraphs separated by blank lines
+- Use bullet points or numbered lists for multiple items
+- Use **bold** for important terms or headings
+Keep the response concise but informative.
+
+Response:"""
+
+# One pooled HTTP client per event loop, shared by every Groq client. Pooled
+# connections belong to the loop that opened them, so a new loop (e.g. each
+# asyncio.run() in process_query) gets a new client
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """The running event loop, or None outside of one"""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Get the shared Groq HTTP client for the running loop, creating it on first use"""
+    global _http_client, _http_client_loop
+    loop = _running_loop()
+    if _http_client is None or _http_client.is_closed or (loop is not None and loop is not _http_client_loop):
+        # A client left on a closed loop is dropped; its sockets can't be awaited from here
+        _http_client_loop = loop
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            timeout=30.0,
+            http2=HTTP2_AVAILABLE
+        )
+    return _http_client
+
+class InterpretBatcher:
+    """
+    Collects concurrent interpret() calls into batches handled by one Groq request.
+    While the pipeline is idle a query is dispatched immediately; while another
+    batch is in flight, callers arriving within max_wait are grouped together.
+    """
+    
+    def __init__(self, handler, max_batch: int = 16, max_wait: float = 0.075):
+        self.handler = handler  # async callable: List[str] -> List[Dict]
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self._in_flight = 0
+        self._dispatches = set()
+    
+    async def submit(self, query: str) -> Dict[str, Any]:
+        """Queue a query for the next batch and wait for its extraction"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            # (Re)start on the current loop, e.g. after asyncio.run() in process_query
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._in_flight = 0
+            self._worker = loop.create_task(self._run())
+        
+        future = loop.create_future()
+        self._queue.put_nowait((query, future))
+        return await future
+    
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            if self._in_flight:
+                # Groq is busy with another batch, give concurrent callers a moment to join
+                await asyncio.sleep(self.max_wait)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            
+            self._in_flight += 1
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+    
+    async def _dispatch(self, batch: List[Tuple[str, "asyncio.Future"]]):
+        try:
+            results = await self.handler([query for query, _ in batch])
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._in_flight -= 1
+    
+    async def aclose(self):
+        """Stop the background worker"""
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+
 class RAGPipeline:
     """
     Restructured RAG Pipeline following 4-step process:
@@ -22,7 +314,25 @@ class RAGPipeline:
     """
     
     def __init__(self):
-        self.groq_client = None
+        self._groq_client = None
+        self._groq_client_http = None
+        # Cleaned extraction JSON keyed by normalized query text
+        self._interpret_cache = LRUCache(maxsize=2048)
+        # KG lookup results keyed by (lookup, label, lower-cased name); lookups
+        # run in worker threads, so access is serialized with a lock
+        self._kg_cache = TTLCache(maxsize=10000, ttl=900)
+        self._kg_cache_lock = threading.Lock()
+        # Live data responses: weather for 10 minutes, mandi prices for an hour
+        self._weather_cache = TTLCache(maxsize=512, ttl=600)
+        self._market_cache = TTLCache(maxsize=2048, ttl=3600)
+        # Answers generated without any KG, live data or entity context, for a day
+        self._generic_responses = TTLCache(maxsize=256, ttl=86400)
+        # Concurrent interpret() calls share Groq requests
+        self._interpret_batcher = InterpretBatcher(self._interpret_many)
+        # Entity-name prefilter, built lazily from the KG (it may still be loading at import)
+        self._entity_matcher = None
+        self._entity_matcher_built = float("-inf")
+        self._entity_matcher_lock = threading.Lock()
         self.initialize_groq()
     
     def initialize_groq(self):
@@ -32,13 +342,33 @@ class RAGPipeline:
                 logger.error("GROQ_API_KEY not configured")
                 return
             
-            self.groq_client = Groq(api_key=config.GROQ_API_KEY)
+            # Reuse pooled (HTTP/2 multiplexed) connections instead of a per-client pool
+            self._groq_client_http = _get_http_client()
+            self._groq_client = AsyncGroq(api_key=config.GROQ_API_KEY, http_client=self._groq_client_http)
             logger.info("Groq client initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing Groq: {e}")
-            self.groq_client = None
+            self._groq_client = None
+    
+    @property
+    def groq_client(self) -> Optional[AsyncGroq]:
+        """Groq client bound to the running loop's shared HTTP client"""
+        if self._groq_client is None:
+            return None
+        http_client = _get_http_client()
+        if http_client is not self._groq_client_http:
+            # The event loop changed; rebind so requests don't reuse the old loop's sockets
+            self._groq_client_http = http_client
+            self._groq_client = self._groq_client.with_options(http_client=http_client)
+        return self._groq_client
     
-    def interpret(self, query: str) -> Dict[str, Any]:
+    async def aclose(self):
+        """Stop the interpret batcher and close the shared Groq HTTP client"""
+        await self._interpret_batcher.aclose()
+        if _http_client is not None and not _http_client.is_closed and _http_client_loop is _running_loop():
+            await _http_client.aclose()
+    
+    async def interpret(self, query: str) -> Dict[str, Any]:
         """
         STEP 1: INTERPRETATION PROMPT
         Extract entities and intent from farmer's query using Groq LLM
@@ -52,36 +382,91 @@ class RAGPipeline:
                 "intent": "general"
             }
         
+        # Repeated queries skip the LLM entirely
+        normalized = query.strip().lower()
+        cached = self._interpret_cache.get(normalized)
+        if cached is not None:
+            return orjson.loads(cached)
+        
+        # Plain-ASCII queries with no known entity and no agricultural keyword
+        # (greetings, small talk) have nothing for Groq to extract; other scripts
+        # can't match the English KG names or keywords, so they always go to Groq
+        if query.isascii():
+            matcher = await self._get_entity_matcher()
+            if matcher and not matcher.has_match(normalized) and not _has_agri_keyword(normalized):
+                logger.info("No entities or intent keywords in query, skipping LLM extraction")
+                return {"entities": {}, "intent": "general"}
+        
+        return await self._interpret_batcher.submit(query)
+    
+    async def _get_entity_matcher(self) -> Optional[EntityMatcher]:
+        """Entity-name prefilter over KG names and weather cities; None until the KG has names"""
+        age = time.monotonic() - self._entity_matcher_built
+        if age < (_ENTITY_MATCHER_TTL if self._entity_matcher else _ENTITY_MATCHER_RETRY):
+            return self._entity_matcher
+        return await asyncio.to_thread(self._refresh_entity_matcher)
+    
+    def _refresh_entity_matcher(self) -> Optional[EntityMatcher]:
+        """Rebuild the entity prefilter from the KG (runs in a worker thread)"""
+        with self._entity_matcher_lock:
+            age = time.monotonic() - self._entity_matcher_built
+            if age < (_ENTITY_MATCHER_TTL if self._entity_matcher else _ENTITY_MATCHER_RETRY):
+                return self._entity_matcher
+            try:
+                entity_names = neo4j_connector.all_entity_names()
+                if entity_names:
+                    names = [name for _, name in entity_names] + list(config.WEATHER_CITIES)
+                    self._entity_matcher = EntityMatcher(names)
+                    logger.info(f"Built entity prefilter with {self._entity_matcher.size} names")
+            except Exception as e:
+                logger.error(f"Error building entity prefilter: {e}")
+            self._entity_matcher_built = time.monotonic()
+            return self._entity_matcher
+    
+    async def _interpret_many(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """Extract entities for a batch of queries with a single Groq request"""
+        if len(queries) == 1:
+            return [await self._interpret_one(queries[0])]
+        
         try:
-            prompt = f"""You are an agricultural entity extraction system. Extract structured information from this farmer's query.
-
-Farmer's Query: "{query}"
-
-Extract the following information and return ONLY valid JSON (no markdown, no explanation):
-{{
-  "entities": {{
-    "crop": "crop name if mentioned, else null",
-    "pests": ["list of pest names if mentioned, else empty array"],
-    "diseases": ["list of disease names if mentioned, else empty array"],
-    "symptoms": ["list of symptoms if mentioned, else empty array"],
-    "region": "region/state/city if mentioned, else null",
-    "fertilizer": "fertilizer name if mentioned, else null",
-    "pesticide": "pesticide name if mentioned, else null",
-    "treatment": "treatment method if mentioned, else null"
-  }},
-  "intent": "one of: weather, market, diagnosis, treatment, advisory, fertilizer_recommendation, pest_control, disease_management, or general"
-}}
-
-Important:
-- Return ONLY the JSON object, no other text
-- Use null for missing values, empty arrays [] for missing lists
-- For intent, choose the most specific one that matches the query
-- Preserve original language terms (Tamil, Hindi, English) in the entities"""
+            numbered = "\n".join(f'{i}. "{query}"' for i, query in enumerate(queries, 1))
+            prompt = _INTERPRET_BATCH_PROMPT % {"queries": numbered, "count": len(queries)}
+            
+            response = await self.groq_client.chat.completions.create(
+                model=_MODEL,
+                messages=[
+                    _SYSTEM_EXTRACT,
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.1,
+                max_tokens=min(400 * len(queries), 6000)
+            )
+            
+            result_text = _FENCE_RE.sub("", response.choices[0].message.content.strip()).strip()
+            extracted_list = orjson.loads(result_text)
+            if (not isinstance(extracted_list, list) or len(extracted_list) != len(queries)
+                    or not all(isinstance(item, dict) for item in extracted_list)):
+                raise ValueError(f"expected {len(queries)} extractions, got: {result_text[:200]}")
+            
+            for query, extracted in zip(queries, extracted_list):
+                self._interpret_cache[query.strip().lower()] = orjson.dumps(extracted).decode()
+            logger.info(f"Extracted entities for a batch of {len(queries)} queries")
+            return extracted_list
+            
+        except Exception as e:
+            logger.warning(f"Batched interpret failed, extracting queries individually: {e}")
+            return list(await asyncio.gather(*(self._interpret_one(query) for query in queries)))
+    
+    async def _interpret_one(self, query: str) -> Dict[str, Any]:
+        """Extract entities for a single query with Groq"""
+        cache_key = query.strip().lower()
+        try:
+            prompt = _INTERPRET_PROMPT % {"query": query}
             
-            response = self.groq_client.chat.completions.create(
-                model=config.GROQ_MODEL,
+            response = await self.groq_client.chat.completions.create(
+                model=_MODEL,
                 messages=[
-                    {"role": "system", "content": "You are a precise JSON extraction system. Always return valid JSON only."},
+                    _SYSTEM_EXTRACT,
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.1,
@@ -91,35 +476,28 @@ Important:
             result_text = response.choices[0].message.content.strip()
             
             # Clean up JSON (remove markdown if present)
-            if result_text.startswith("```json"):
-                result_text = result_text[7:]
-            if result_text.startswith("```"):
-                result_text = result_text[3:]
-            if result_text.endswith("```"):
-                result_text = result_text[:-3]
-            result_text = result_text.strip()
-            
-            extracted = json.loads(result_text)
+            result_text = _FENCE_RE.sub("", result_text).strip()
+            
+            extracted = orjson.loads(result_text)
+            self._interpret_cache[cache_key] = result_text
             logger.info(f"Extracted entities: {extracted.get('entities')}, intent: {extracted.get('intent')}")
             return extracted
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"JSON decode error in interpret: {e}, result: {result_text[:200]}")
             # Retry with simpler prompt
             try:
-                retry_prompt = f"""Extract entities from: "{query}". Return JSON: {{"entities": {{"crop": null, "pests": [], "diseases": [], "region": null}}, "intent": "general"}}"""
-                response = self.groq_client.chat.completions.create(
-                    model=config.GROQ_MODEL,
+                retry_prompt = _INTERPRET_RETRY_PROMPT % {"query": query}
+                response = await self.groq_client.chat.completions.create(
+                    model=_MODEL,
                     messages=[{"role": "user", "content": retry_prompt}],
                     temperature=0.1,
                     max_tokens=200
                 )
                 result_text = response.choices[0].message.content.strip()
-                if result_text.startswith("```"):
-                    result_text = result_text.split("```")[1].strip()
-                if result_text.startswith("json"):
-                    result_text = result_text[4:].strip()
-                extracted = json.loads(result_text)
+                result_text = _FENCE_RE.sub("", result_text).strip()
+                extracted = orjson.loads(result_text)
+                self._interpret_cache[cache_key] = result_text
                 return extracted
             except:
                 # Return minimal structure - LLM will handle response
@@ -129,7 +507,43 @@ Important:
             # Return minimal structure - LLM will handle response
             return {"entities": {}, "intent": "general"}
     
-    def query_kg(self, extracted: Dict[str, Any]) -> List[Dict]:
+    def _cached_kg_lookup(self, key: tuple, lookup, *args):
+        """Serve a KG lookup from the TTL cache, calling the connector on a miss"""
+        with self._kg_cache_lock:
+            cached = self._kg_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        result = lookup(*args)
+        # Connector methods return empty results on errors, so only cache hits
+        if result:
+            with self._kg_cache_lock:
+                self._kg_cache[key] = result
+        return result
+    
+    def _batch_search(self, pairs: List[Tuple[str, str]]) -> List[List[Dict]]:
+        """Cached neo4j_connector.batch_search; only cache misses are sent to Neo4j"""
+        keys = [("entities", label, name.lower()) for label, name in pairs]
+        with self._kg_cache_lock:
+            results = [self._kg_cache.get(key) for key in keys]
+        
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            fetched = neo4j_connector.batch_search([pairs[i] for i in missing])
+            with self._kg_cache_lock:
+                for i, found in zip(missing, fetched):
+                    results[i] = found
+                    # Connector returns empty results on errors, so only cache hits
+                    if found:
+                        self._kg_cache[keys[i]] = found
+        return results
+    
+    def _related_entities(self, name: str) -> Dict[str, List[Dict]]:
+        """Cached neo4j_connector.get_related_entities"""
+        return self._cached_kg_lookup(("related", None, name.lower()),
+                                      neo4j_connector.get_related_entities, name)
+    
+    async def query_kg(self, extracted: Dict[str, Any]) -> List[Dict]:
         """
         STEP 2: KG QUERY (No LLM)
         Search Neo4j knowledge graph using extracted entities
@@ -137,62 +551,51 @@ Important:
         """
         try:
             entities = extracted.get("entities", {})
-            results = []
             
-            # Search for crop
+            # Collect every (label, name) to search so they go out in one query
+            pairs = []
             if entities.get("crop"):
-                crop_results = neo4j_connector.search_entities("Crop", entities["crop"])
-                results.extend(crop_results)
-            
-            # Search for pests
-            for pest in entities.get("pests", []):
-                pest_results = neo4j_connector.search_entities("Pest", pest)
-                results.extend(pest_results)
+                pairs.append(("Crop", entities["crop"]))
+            pairs.extend(("Pest", pest) for pest in entities.get("pests", []))
+            pairs.extend(("Disease", disease) for disease in entities.get("diseases", []))
+            if entities.get("region"):
+                pairs.append(("Region", entities["region"]))
+            if entities.get("fertilizer"):
+                pairs.append(("Fertilizer", entities["fertilizer"]))
+            if entities.get("pesticide"):
+                pairs.append(("Pesticide", entities["pesticide"]))
+            if entities.get("treatment"):
+                pairs.append(("ControlMethod", entities["treatment"]))
             
-            # Search for diseases
-            for disease in entities.get("diseases", []):
-                disease_results = neo4j_connector.search_entities("Disease", disease)
-                results.extend(disease_results)
+            # Speculatively fetch the crop's related entities alongside the search
+            lookups = [asyncio.to_thread(self._batch_search, pairs)]
+            if entities.get("crop"):
+                lookups.append(asyncio.to_thread(self._related_entities, entities["crop"]))
             
-            # Search for region
-            if entities.get("region"):
-                region_results = neo4j_connector.search_entities("Region", entities["region"])
-                results.extend(region_results)
+            lookup_results = await asyncio.gather(*lookups, return_exceptions=True)
             
-            # Search for fertilizer
-            if entities.get("fertilizer"):
-                fert_results = neo4j_connector.search_fertilizers_pesticides(entities["fertilizer"], "fertilizer")
-                results.extend(fert_results)
+            results = []
+            if isinstance(lookup_results[0], Exception):
+                logger.error(f"KG search failed: {lookup_results[0]}")
+            else:
+                for pair_results in lookup_results[0]:
+                    results.extend(pair_results)
             
-            # Search for pesticide
-            if entities.get("pesticide"):
-                pest_results = neo4j_connector.search_fertilizers_pesticides(entities["pesticide"], "pesticide")
-                results.extend(pest_results)
+            related = lookup_results[1] if len(lookup_results) > 1 else {}
             
-            # Search for treatment/control methods
-            if entities.get("treatment"):
-                treatment_results = neo4j_connector.search_entities("ControlMethod", entities["treatment"])
-                results.extend(treatment_results)
-            
-            # Get related entities if we found a crop
-            if entities.get("crop") and results:
-                # Find relationships for the crop
-                crop_name = entities["crop"]
-                related = neo4j_connector.get_related_entities(crop_name)
+            # Get related entities if we found anything for the crop query
+            if results and isinstance(related, dict):
                 for rel_type, rel_entities in related.items():
                     results.extend(rel_entities)
             
-            # Remove duplicates based on name
-            seen = set()
-            unique_results = []
+            # Remove duplicates based on case-insensitive name (first one wins)
+            unique = {}
             for item in results:
-                name = item.get("name", str(item))
-                if name not in seen:
-                    seen.add(name)
-                    unique_results.append(item)
+                key = str(item.get("name") or "").strip().lower() or id(item)
+                unique.setdefault(key, item)
             
-            logger.info(f"KG query returned {len(unique_results)} results")
-            return unique_results[:20]  # Limit to 20 results
+            logger.info(f"KG query returned {len(unique)} results")
+            return list(unique.values())[:20]  # Limit to 20 results
             
         except Exception as e:
             logger.error(f"Error in query_kg step: {e}")
@@ -217,7 +620,12 @@ Important:
                     context_parts.append("Please specify a region/city for weather information.")
                 else:
                     try:
-                        weather_data = await live_data_service.upsert_weather_for_city(region)
+                        weather_key = region.lower()
+                        weather_data = self._weather_cache.get(weather_key)
+                        if weather_data is None:
+                            weather_data = await live_data_service.upsert_weather_for_city(region)
+                            if weather_data:
+                                self._weather_cache[weather_key] = weather_data
                         if weather_data:
                             context_parts.append(
                                 f"Weather in {weather_data.get('region', region)}: "
@@ -243,11 +651,15 @@ Important:
                         params["filters[district]"] = entities["region"]
                     
                     try:
-                        prices = await live_data_service.upsert_market_prices(params)
+                        market_key = tuple(sorted(params.items()))
+                        prices = self._market_cache.get(market_key)
+                        if prices is None:
+                            prices = await live_data_service.upsert_market_prices(params)
+                            if prices:
+                                self._market_cache[market_key] = prices
                         if prices:
-                            # Sort by date (most recent first)
-                            prices_sorted = sorted(prices, key=lambda p: p.get("date", ""), reverse=True)
-                            for price in prices_sorted[:5]:  # Top 5 prices
+                            # Top 5 prices, most recent first
+                            for price in heapq.nlargest(5, prices, key=price_date_key):
                                 loc = price.get('market') or price.get('district') or price.get('state') or '—'
                                 variety = f", {price.get('variety')}" if price.get('variety') else ""
                                 context_parts.append(
@@ -271,7 +683,48 @@ Important:
             logger.error(f"Error in enrich step: {e}")
             return []
     
-    def gen(self, query: str, kg_results: List[Dict], live_context: List[str], 
+    def _build_gen_messages(self, query: str, kg_results: List[Dict], live_context: List[str],
+                            original_language: str = "auto") -> List[Dict[str, str]]:
+        """Build the chat messages for the final RAG response prompt"""
+        # Format KG context (top 10 KG results, most relevant properties only)
+        kg_context = ""
+        if kg_results:
+            lines = []
+            for result in kg_results[:10]:
+                name = result.get("name", "Unknown")
+                props = {k: result[k] for k in _top_props(result)}
+                if props:
+                    lines.append(f"- {name}: {orjson.dumps(props, default=str, option=orjson.OPT_NON_STR_KEYS).decode()}")
+                else:
+                    lines.append(f"- {name}")
+            kg_context = "Knowledge Graph Information:\n" + "\n".join(lines) + "\n"
+        
+        # Format live data context
+        live_context_str = ""
+        if live_context:
+            live_context_str = "\n\nLive Data:\n" + "\n".join(live_context)
+        
+        # Build the RAG prompt
+        prompt = _GEN_PROMPT % {
+            "query": query,
+            "kg_context": kg_context if kg_context else "No specific knowledge graph data available.",
+            "live_context": live_context_str,
+            "language": _LANG_NAME.get(original_language, "English"),
+        }
+        
+        return [
+            _SYSTEM_GEN,
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _generic_response_key(self, query: str, kg_results: List[Dict], live_context: List[str],
+                              extracted: Dict[str, Any], original_language: str) -> Optional[Tuple[str, str, str]]:
+        """Cache key for answers that depend on nothing but the question; None when context was found"""
+        if kg_results or live_context or any(extracted.get("entities", {}).values()):
+            return None
+        return (query.strip().lower(), extracted.get("intent", "general"), original_language)
+    
+    async def gen(self, query: str, kg_results: List[Dict], live_context: List[str], 
             extracted: Dict[str, Any], original_language: str = "auto") -> str:
         """
         STEP 4: FINAL RESPONSE GENERATION (RAG Prompt)
@@ -279,71 +732,78 @@ Important:
         Answer in the farmer's original language
         """
         if not self.groq_client:
-            return self._fallback_response(query, kg_results)
+            return await self._fallback_response(query, kg_results)
+        
+        generic_key = self._generic_response_key(query, kg_results, live_context, extracted, original_language)
+        if generic_key is not None:
+            cached = self._generic_responses.get(generic_key)
+            if cached is not None:
+                logger.info("Serving context-free response from cache")
+                return cached
         
         try:
-            # Format KG context
-            kg_context = ""
-            if kg_results:
-                kg_context = "Knowledge Graph Information:\n"
-                for result in kg_results[:10]:  # Top 10 KG results
-                    name = result.get("name", "Unknown")
-                    # Format properties
-                    props = {k: v for k, v in result.items() if k != "name" and v is not None}
-                    if props:
-                        kg_context += f"- {name}: {json.dumps(props, default=str, ensure_ascii=False)}\n"
-                    else:
-                        kg_context += f"- {name}\n"
-            
-            # Format live data context
-            live_context_str = ""
-            if live_context:
-                live_context_str = "\n\nLive Data:\n" + "\n".join(live_context)
-            
-            # Build the RAG prompt
-            prompt = f"""You are Prakriti, an AI agricultural advisor specializing in Indian agriculture.
-
-Farmer's Question: "{query}"
-
-Context from Knowledge Graph:
-{kg_context if kg_context else "No specific knowledge graph data available."}
-{live_context_str}
-
-Instructions:
-1. Answer the farmer's question using the provided context if available
-2. If context is available, use it to provide accurate, specific advice
-3. If context is limited or unavailable, provide helpful agricultural advice based on your knowledge of Indian agriculture
-4. Answer in the SAME LANGUAGE as the farmer's question ({"Tamil" if original_language == "ta" else "Hindi" if original_language == "hi" else "English"})
-5. Be practical, actionable, and specific to Indian farming conditions
-6. If discussing crops, pests, or diseases, mention specific regions when relevant
-7. Structure your response clearly using markdown formatting:
-   - Use paragraphs separated by blank lines
-   - Use bullet points or numbered lists for multiple items
-   - Use **bold** for important terms or headings
-8. Keep the response concise (2-4 sentences per paragraph) but informative
-9. If you don't have specific data (e.g., current market prices), provide general guidance based on your knowledge
-
-Response:"""
-            
-            response = self.groq_client.chat.completions.create(
-                model=config.GROQ_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are Prakriti, an expert agricultural advisor for Indian farmers. Provide practical, actionable advice in the farmer's language. Structure your response clearly using markdown formatting with paragraphs, bullet points, and bold text where appropriate."},
-                    {"role": "user", "content": prompt}
-                ],
+            response = await self.groq_client.chat.completions.create(
+                model=_MODEL,
+                messages=self._build_gen_messages(query, kg_results, live_context, original_language),
                 temperature=0.7,
                 max_tokens=500
             )
             
             answer = response.choices[0].message.content.strip()
             logger.info(f"Generated response using Groq (length: {len(answer)})")
+            if generic_key is not None and answer:
+                self._generic_responses[generic_key] = answer
             return answer
             
         except Exception as e:
             logger.error(f"Error in gen step: {e}")
-            return self._fallback_response(query, kg_results)
+            return await self._fallback_response(query, kg_results)
+    
+    async def gen_stream(self, query: str, kg_results: List[Dict], live_context: List[str],
+                         extracted: Dict[str, Any], original_language: str = "auto") -> AsyncIterator[str]:
+        """
+        STEP 4 (streaming): same prompt as gen(), yielding answer text as Groq produces it
+        Falls back to a single non-streamed fallback answer if nothing was streamed
+        """
+        if not self.groq_client:
+            yield await self._fallback_response(query, kg_results)
+            return
+        
+        generic_key = self._generic_response_key(query, kg_results, live_context, extracted, original_language)
+        if generic_key is not None:
+            cached = self._generic_responses.get(generic_key)
+            if cached is not None:
+                logger.info("Serving context-free response from cache")
+                yield cached
+                return
+        
+        streamed = False
+        chunks = []
+        try:
+            stream = await self.groq_client.chat.completions.create(
+                model=_MODEL,
+                messages=self._build_gen_messages(query, kg_results, live_context, original_language),
+                temperature=0.7,
+                max_tokens=500,
+                stream=True
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    streamed = True
+                    chunks.append(delta)
+                    yield delta
+            
+            answer = "".join(chunks).strip()
+            if generic_key is not None and answer:
+                self._generic_responses[generic_key] = answer
+            
+        except Exception as e:
+            logger.error(f"Error in gen_stream step: {e}")
+            if not streamed:
+                yield await self._fallback_response(query, kg_results)
     
-    def _fallback_response(self, query: str, kg_results: List[Dict]) -> str:
+    async def _fallback_response(self, query: str, kg_results: List[Dict]) -> str:
         """Fallback response using LLM with minimal context if Groq fails initially"""
         # Try to use LLM even if initial call failed
         if not self.groq_client:
@@ -356,24 +816,12 @@ Response:"""
                 entities = [item.get("name", "Unknown") for item in kg_results[:5]]
                 context = f"Knowledge base contains: {', '.join(entities)}. "
             
-            prompt = f"""You are Prakriti, an AI agricultural advisor for Indian farmers.
-
-Farmer's Question: "{query}"
-
-{context}Please provide a helpful response based on your knowledge of Indian agriculture. If you don't have specific information, provide general agricultural advice.
-
-Structure your response clearly using markdown formatting:
-- Use paragraphs separated by blank lines
-- Use bullet points or numbered lists for multiple items
-- Use **bold** for important terms or headings
-Keep the response concise but informative.
-
-Response:"""
+            prompt = _FALLBACK_PROMPT % {"query": query, "context": context}
             
-            response = self.groq_client.chat.completions.create(
-                model=config.GROQ_MODEL,
+            response = await self.groq_client.chat.completions.create(
+                model=_MODEL,
                 messages=[
-                    {"role": "system", "content": "You are Prakriti, an expert agricultural advisor for Indian farmers."},
+                    _SYSTEM_FALLBACK,
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
@@ -385,10 +833,10 @@ Response:"""
             logger.error(f"Error in fallback response: {e}")
             # Last resort - let LLM answer with no context
             try:
-                response = self.groq_client.chat.completions.create(
-                    model=config.GROQ_MODEL,
+                response = await self.groq_client.chat.completions.create(
+                    model=_MODEL,
                     messages=[
-                        {"role": "system", "content": "You are Prakriti, an agricultural advisor. Structure your response clearly using markdown formatting with paragraphs, bullet points, and bold text where appropriate."},
+                        _SYSTEM_LAST_RESORT,
                         {"role": "user", "content": f"Answer this agricultural question: {query}"}
                     ],
                     temperature=0.7,
@@ -398,33 +846,34 @@ Response:"""
             except:
                 return "I apologize, but I'm experiencing technical difficulties. Please try again later."
     
-    async def process_multilingual_query(self, query: str, language: str = "auto") -> Dict[str, Any]:
+    async def process_multilingual_query(self, query: str, language: str = "auto",
+                                         stream: bool = False) -> Dict[str, Any]:
         """
         Main processing pipeline: 4-step process
         Handles multilingual queries (Llama 3.1 8B handles languages directly)
+        With stream=True, "response" is an async iterator of answer text chunks
         """
         try:
             # Detect language if auto
             if language == "auto":
                 # Simple detection based on script
-                if any('\u0B80' <= char <= '\u0BFF' for char in query):
-                    language = "ta"  # Tamil
-                elif any('\u0900' <= char <= '\u097F' for char in query):
-                    language = "hi"  # Hindi
-                else:
-                    language = "en"  # English
+                language = _detect_language(query)
             
             # STEP 1: INTERPRETATION
-            extracted = self.interpret(query)
-            
-            # STEP 2: KG QUERY
-            kg_results = self.query_kg(extracted)
+            extracted = await self.interpret(query)
             
-            # STEP 3: LIVE DATA ENRICHMENT
-            live_context = await self.enrich(extracted)
+            # STEP 2 + 3: KG QUERY and LIVE DATA ENRICHMENT
+            # Both only depend on the extraction, so run them concurrently
+            kg_results, live_context = await asyncio.gather(
+                self.query_kg(extracted),
+                self.enrich(extracted)
+            )
             
             # STEP 4: FINAL RESPONSE GENERATION
-            response = self.gen(query, kg_results, live_context, extracted, language)
+            if stream:
+                response = self.gen_stream(query, kg_results, live_context, extracted, language)
+            else:
+                response = await self.gen(query, kg_results, live_context, extracted, language)
             
             # Format response
             return {
@@ -460,7 +909,7 @@ Response:"""
         """Process voice query with speech-to-text"""
         try:
             # Convert speech to text
-            text_query = await voice_handler.speech_to_text(audio_data, language)
+            text_query = await get_voice_handler().speech_to_text(audio_data, language)
             
             if not text_query:
                 return {
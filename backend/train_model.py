@@ -6,17 +6,97 @@ import logging
 import pandas as pd
 import numpy as np
 import joblib
-import json
+import orjson
+import hashlib
+import warnings
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, confusion_matrix, classification_report
+from sklearn.metrics import confusion_matrix, classification_report
+import xgboost as xgb
 from xgboost import XGBClassifier
 from data_loader import FertilizerDataLoader
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Training sets larger than this first boost on a stratified subsample
+WARMUP_MIN_ROWS = 50_000
+NUM_BOOST_ROUND = 1000
+# Feature dtype the model is trained on; saved in the bundle so serving matches
+FEATURE_DTYPE = "float32"
+
+def detect_xgboost_device() -> str:
+    """Return "cuda" if XGBoost was built with CUDA and a GPU is usable, otherwise "cpu"."""
+    try:
+        if not xgb.build_info().get("USE_CUDA"):
+            return "cpu"
+        # A CUDA build can still run on a machine without a visible GPU, where XGBoost only
+        # warns and falls back to CPU; probe with a tiny fit and check the device it used
+        probe = xgb.DMatrix(np.array([[0.0], [1.0]]), label=np.array([0, 1]))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            booster = xgb.train({"device": "cuda", "tree_method": "hist"}, probe, num_boost_round=1)
+        device = orjson.loads(booster.save_config())["learner"]["generic_param"]["device"]
+        if not device.startswith("cuda"):
+            logger.info("No usable GPU found for XGBoost, training on CPU")
+            return "cpu"
+        return "cuda"
+    except Exception as e:
+        logger.info(f"CUDA not available for XGBoost, training on CPU: {e}")
+        return "cpu"
+
+def report_from_confusion_matrix(cm: np.ndarray) -> Tuple[Dict[str, Any], str]:
+    """
+    Build sklearn's classification_report (dict and text) from a confusion matrix
+    
+    Per-class precision/recall/F1 come from the matrix's row/column sums and
+    diagonal, so the predictions are only scanned once (by confusion_matrix).
+    Like classification_report without `labels`, classes that appear in neither
+    y_true nor y_pred are left out of the report and its macro average.
+    """
+    true_positives = cm.diagonal().astype(np.float64)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    total = support.sum()
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.nan_to_num(true_positives / predicted)
+        recall = np.nan_to_num(true_positives / support)
+        f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+    labels = np.flatnonzero((support > 0) | (predicted > 0))
+    
+    report = {
+        str(label): {
+            'precision': float(precision[label]),
+            'recall': float(recall[label]),
+            'f1-score': float(f1[label]),
+            'support': float(support[label])
+        }
+        for label in labels
+    }
+    accuracy = float(true_positives.sum() / total) if total else 0.0
+    report['accuracy'] = accuracy
+    weights = support / total if total else np.zeros_like(precision)
+    for name, (p, r, f) in (
+        ('macro avg', (precision[labels].mean(), recall[labels].mean(), f1[labels].mean())),
+        ('weighted avg', ((precision * weights).sum(), (recall * weights).sum(), (f1 * weights).sum())),
+    ):
+        report[name] = {'precision': float(p), 'recall': float(r), 'f1-score': float(f), 'support': float(total)}
+    
+    width = max(len('weighted avg'), *(len(str(label)) for label in labels))
+    lines = [f"{'':>{width}} {'precision':>9} {'recall':>9} {'f1-score':>9} {'support':>9}", ""]
+    for label in labels:
+        row = report[str(label)]
+        lines.append(f"{label:>{width}} {row['precision']:>9.2f} {row['recall']:>9.2f} {row['f1-score']:>9.2f} {int(row['support']):>9}")
+    lines.append("")
+    lines.append(f"{'accuracy':>{width}} {'':>9} {'':>9} {accuracy:>9.2f} {int(total):>9}")
+    for name in ('macro avg', 'weighted avg'):
+        row = report[name]
+        lines.append(f"{name:>{width}} {row['precision']:>9.2f} {row['recall']:>9.2f} {row['f1-score']:>9.2f} {int(total):>9}")
+    
+    return report, "\n".join(lines)
+
 class FertilizerModelTrainer:
     """Train and evaluate XGBoost model for fertilizer prediction"""
     
@@ -26,8 +106,12 @@ class FertilizerModelTrainer:
         self.model_dir.mkdir(parents=True, exist_ok=True)
         self.model = None
         self.feature_importances = {}
+        self._dmatrix_cache = {}  # dataset hash -> (dtrain, dtest) QuantileDMatrix pair
+        self._device = detect_xgboost_device()
+        logger.info(f"XGBoost training device: {self._device}")
         
-    def train(self, filename: str = "train.csv", test_size: float = 0.2, random_state: int = 42):
+    def train(self, filename: str = "train.csv", test_size: float = 0.2, random_state: int = 42,
+              warmup_frac: float = 0.1):
         """
         Train XGBoost model
         
@@ -35,6 +119,7 @@ class FertilizerModelTrainer:
             filename: CSV filename to load
             test_size: Proportion of data for testing
             random_state: Random seed
+            warmup_frac: Fraction of the training set used for the warm-up rounds on large datasets
         """
         try:
             # Load and preprocess data
@@ -44,6 +129,10 @@ class FertilizerModelTrainer:
             logger.info("Preprocessing data...")
             X, y = self.data_loader.preprocess_data(df)
             
+            # XGBoost bins in float32 anyway; halve the bytes copied into every matrix
+            X = X.astype(FEATURE_DTYPE)
+            y = y.astype(np.int32, copy=False)
+            
             # Split data
             logger.info(f"Splitting data (test_size={test_size})...")
             X_train, X_test, y_train, y_test = train_test_split(
@@ -53,51 +142,89 @@ class FertilizerModelTrainer:
             logger.info(f"Training set: {X_train.shape[0]} samples")
             logger.info(f"Test set: {X_test.shape[0]} samples")
             
-            # Initialize XGBoost model with optimized hyperparameters for high accuracy
+            # XGBoost parameters, optimized for high accuracy
             logger.info("Initializing XGBoost model with optimized parameters...")
-            self.model = XGBClassifier(
-                n_estimators=1000,
-                learning_rate=0.03,
-                max_depth=10,
-                min_child_weight=2,
-                subsample=0.85,
-                colsample_bytree=0.85,
-                gamma=0.05,
-                reg_alpha=0.05,
-                reg_lambda=0.5,
-                random_state=random_state,
-                objective='multi:softprob',
-                eval_metric='mlogloss',
-                n_jobs=-1,
-                early_stopping_rounds=100,
-                tree_method='hist'
-            )
+            # Histogram building and split search run on the GPU when one is available
+            params = {
+                'learning_rate': 0.03,
+                'max_depth': 10,
+                'min_child_weight': 2,
+                'subsample': 0.85,
+                'colsample_bytree': 0.85,
+                'gamma': 0.05,
+                'reg_alpha': 0.05,
+                'reg_lambda': 0.5,
+                'seed': random_state,
+                'objective': 'multi:softprob',
+                'num_class': len(self.data_loader.class_names),
+                'eval_metric': 'mlogloss',
+                'tree_method': 'hist',
+                'device': self._device
+            }
+            
+            # Quantize once; the eval set reuses the training bin edges
+            dtrain, dtest = self._get_quantile_matrices(X_train, y_train, X_test, y_test)
+            
+            # Large datasets: boost on a stratified subsample until early stopping,
+            # then keep boosting from the best warm-up round on the full training set
+            warm_booster = None
+            if X_train.shape[0] > WARMUP_MIN_ROWS:
+                X_warm, _, y_warm, _ = train_test_split(
+                    X_train, y_train, train_size=warmup_frac, random_state=random_state, stratify=y_train
+                )
+                logger.info(f"Warm-up training on {X_warm.shape[0]} samples...")
+                dwarm = xgb.QuantileDMatrix(X_warm, y_warm, ref=dtrain)
+                # An eval QuantileDMatrix must reference the matrix it evaluates; the bin
+                # edges still come from dtrain through dwarm
+                dwarm_eval = xgb.QuantileDMatrix(X_test, y_test, ref=dwarm)
+                warm_booster = xgb.train(
+                    params, dwarm,
+                    num_boost_round=NUM_BOOST_ROUND,
+                    evals=[(dwarm_eval, 'val')],
+                    early_stopping_rounds=100,
+                    verbose_eval=False
+                )
+                warm_booster = warm_booster[:warm_booster.best_iteration + 1]
+                logger.info(f"Warm-up stopped after {warm_booster.num_boosted_rounds()} rounds")
             
             # Train model
             logger.info("Training model...")
-            self.model.fit(
-                X_train, y_train,
-                eval_set=[(X_test, y_test)],
-                verbose=False
+            booster = xgb.train(
+                params, dtrain,
+                # At least one early-stopping window on the full set, even if the warm-up used the whole budget
+                num_boost_round=max(NUM_BOOST_ROUND - (warm_booster.num_boosted_rounds() if warm_booster else 0), 100),
+                evals=[(dtest, 'val')],
+                early_stopping_rounds=100,
+                verbose_eval=False,
+                xgb_model=warm_booster
             )
+            logger.info(f"Best iteration: {booster.best_iteration}")
+            
+            # Wrap the booster in XGBClassifier so prediction and saving work as before;
+            # only the trees are carried over, so the wrapper predicts on CPU
+            self.model = XGBClassifier()
+            self.model.load_model(bytearray(booster.save_raw('ubj')))
             
             # Evaluate model
             logger.info("Evaluating model...")
-            y_pred = self.model.predict(X_test)
-            accuracy = accuracy_score(y_test, y_pred)
+            # Predict straight from the test buffer (no DMatrix), using the early-stopping best trees
+            booster = self.model.get_booster()
+            proba = booster.inplace_predict(X_test, iteration_range=(0, booster.best_iteration + 1))
+            y_pred = proba.argmax(axis=1)
             
-            logger.info(f"Model Accuracy: {accuracy:.4f}")
+            # One confusion matrix gives accuracy and the per-class report
+            cm = confusion_matrix(y_test, y_pred, labels=np.arange(len(self.data_loader.class_names)))
+            report, report_text = report_from_confusion_matrix(cm)
+            accuracy = report['accuracy']
             
-            # Classification report
-            report = classification_report(y_test, y_pred, output_dict=True)
-            logger.info(f"Classification Report:\n{classification_report(y_test, y_pred)}")
+            logger.info(f"Model Accuracy: {accuracy:.4f}")
+            logger.info(f"Classification Report:\n{report_text}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"sklearn classification report:\n{classification_report(y_test, y_pred)}")
             
-            # Extract feature importances (convert numpy types to Python types for JSON)
+            # Extract feature importances (float64 scalars; orjson serializes them natively)
             feature_names = self.data_loader.get_feature_names()
-            self.feature_importances = {
-                name: float(importance) 
-                for name, importance in zip(feature_names, self.model.feature_importances_)
-            }
+            self.feature_importances = dict(zip(feature_names, self.model.feature_importances_.astype(np.float64)))
             
             # Save model and feature importances
             self.save_model()
@@ -113,32 +240,41 @@ class FertilizerModelTrainer:
             logger.error(f"Error training model: {e}")
             raise
     
-    def save_model(self, filename: str = "fertilizer_model.pkl"):
-        """Save trained model to disk"""
+    def _get_quantile_matrices(self, X_train, y_train, X_test, y_test) -> Tuple[xgb.QuantileDMatrix, xgb.QuantileDMatrix]:
+        """Build (or reuse for an identical split) the train/eval QuantileDMatrix pair"""
+        digest = hashlib.blake2b(digest_size=16)
+        for X, y in ((X_train, y_train), (X_test, y_test)):
+            digest.update(pd.util.hash_pandas_object(X, index=True).values.tobytes())
+            digest.update(np.ascontiguousarray(y).tobytes())
+        key = digest.hexdigest()
+        
+        if key not in self._dmatrix_cache:
+            logger.info("Building QuantileDMatrix for train and eval sets...")
+            dtrain = xgb.QuantileDMatrix(X_train, y_train)
+            dtest = xgb.QuantileDMatrix(X_test, y_test, ref=dtrain)
+            # Only the most recent dataset is kept
+            self._dmatrix_cache = {key: (dtrain, dtest)}
+        else:
+            logger.info("Reusing cached QuantileDMatrix for identical dataset")
+        return self._dmatrix_cache[key]
+    
+    def save_model(self, filename: str = "fertilizer_bundle.joblib", model_filename: str = "fertilizer_model.ubj"):
+        """Save the model in XGBoost's native UBJSON format and the preprocessors as one lz4-compressed bundle"""
         try:
-            model_path = self.model_dir / filename
-            joblib.dump(self.model, model_path)
+            model_path = self.model_dir / model_filename
+            self.model.save_model(model_path)
             logger.info(f"Model saved to: {model_path}")
             
-            # Also save label encoders
-            encoders_path = self.model_dir / "label_encoders.pkl"
-            joblib.dump(self.data_loader.label_encoders, encoders_path)
-            logger.info(f"Label encoders saved to: {encoders_path}")
-            
-            # Save target encoder
-            target_encoder_path = self.model_dir / "target_encoder.pkl"
-            joblib.dump(self.data_loader.target_encoder, target_encoder_path)
-            logger.info(f"Target encoder saved to: {target_encoder_path}")
-            
-            # Save scaler
-            scaler_path = self.model_dir / "scaler.pkl"
-            joblib.dump(self.data_loader.scaler, scaler_path)
-            logger.info(f"StandardScaler saved to: {scaler_path}")
-            
-            # Save feature columns
-            feature_cols_path = self.model_dir / "feature_columns.pkl"
-            joblib.dump(self.data_loader.get_feature_names(), feature_cols_path)
-            logger.info(f"Feature columns saved to: {feature_cols_path}")
+            bundle = {
+                "label_encoders": self.data_loader.label_encoders,
+                "target_encoder": self.data_loader.target_encoder,
+                "scaler": self.data_loader.scaler,
+                "feature_columns": self.data_loader.get_feature_names(),
+                "feature_dtype": FEATURE_DTYPE,
+            }
+            bundle_path = self.model_dir / filename
+            joblib.dump(bundle, bundle_path, compress=("lz4", 3))
+            logger.info(f"Preprocessors saved to: {bundle_path}")
         
         except Exception as e:
             logger.error(f"Error saving model: {e}")
@@ -148,50 +284,83 @@ class FertilizerModelTrainer:
         """Save feature importances to JSON"""
         try:
             importance_path = self.model_dir / filename
-            with open(importance_path, 'w') as f:
-                json.dump(self.feature_importances, f, indent=2)
+            importance_path.write_bytes(orjson.dumps(
+                self.feature_importances,
+                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_INDENT_2
+            ))
             logger.info(f"Feature importances saved to: {importance_path}")
         
         except Exception as e:
             logger.error(f"Error saving feature importances: {e}")
             raise
     
-    def load_model(self, filename: str = "fertilizer_model.pkl"):
+    def load_model(self, filename: str = "fertilizer_bundle.joblib", model_filename: str = "fertilizer_model.ubj"):
         """Load trained model from disk"""
         try:
-            model_path = self.model_dir / filename
-            if not model_path.exists():
-                raise FileNotFoundError(f"Model file not found: {model_path}")
-            
-            self.model = joblib.load(model_path)
-            logger.info(f"Model loaded from: {model_path}")
-            
-            # Load label encoders
-            encoders_path = self.model_dir / "label_encoders.pkl"
-            if encoders_path.exists():
-                self.data_loader.label_encoders = joblib.load(encoders_path)
-                logger.info(f"Label encoders loaded from: {encoders_path}")
-            
-            # Load target encoder
-            target_encoder_path = self.model_dir / "target_encoder.pkl"
-            if target_encoder_path.exists():
-                self.data_loader.target_encoder = joblib.load(target_encoder_path)
-                self.data_loader.class_names = self.data_loader.target_encoder.classes_
-                logger.info(f"Target encoder loaded from: {target_encoder_path}")
+            bundle_path = self.model_dir / filename
+            if bundle_path.exists():
+                bundle = joblib.load(bundle_path)
+                model_path = self.model_dir / model_filename
+                if model_path.exists():
+                    self.model = XGBClassifier()
+                    self.model.load_model(model_path)
+                else:
+                    # Bundles written before the UBJ format carry the pickled model
+                    self.model = bundle["model"]
+                self.data_loader.label_encoders = bundle["label_encoders"]
+                self.data_loader.target_encoder = bundle["target_encoder"]
+                self.data_loader.scaler = bundle["scaler"]
+                self.data_loader.feature_columns = bundle["feature_columns"]
+                if self.data_loader.target_encoder is not None:
+                    self.data_loader.class_names = self.data_loader.target_encoder.classes_
+                logger.info(f"Model bundle loaded from: {bundle_path}")
                 logger.info(f"Fertilizer classes: {self.data_loader.class_names}")
+                return True
             
-            # Load feature columns
-            feature_cols_path = self.model_dir / "feature_columns.pkl"
-            if feature_cols_path.exists():
-                feature_names = joblib.load(feature_cols_path)
-                self.data_loader.feature_columns = feature_names
-                logger.info(f"Feature columns loaded: {feature_names}")
-            
-            return True
+            # Fall back to the per-object pickles written by older versions
+            return self._load_legacy_model()
         
         except Exception as e:
             logger.error(f"Error loading model: {e}")
             return False
+    
+    def _load_legacy_model(self) -> bool:
+        """Load a model saved as separate pickles (pre-bundle layout)"""
+        model_path = self.model_dir / "fertilizer_model.pkl"
+        if not model_path.exists():
+            raise FileNotFoundError(f"Model file not found: {self.model_dir / 'fertilizer_bundle.joblib'}")
+        
+        self.model = joblib.load(model_path)
+        logger.info(f"Model loaded from: {model_path}")
+        
+        # Load label encoders
+        encoders_path = self.model_dir / "label_encoders.pkl"
+        if encoders_path.exists():
+            self.data_loader.label_encoders = joblib.load(encoders_path)
+            logger.info(f"Label encoders loaded from: {encoders_path}")
+        
+        # Load target encoder
+        target_encoder_path = self.model_dir / "target_encoder.pkl"
+        if target_encoder_path.exists():
+            self.data_loader.target_encoder = joblib.load(target_encoder_path)
+            self.data_loader.class_names = self.data_loader.target_encoder.classes_
+            logger.info(f"Target encoder loaded from: {target_encoder_path}")
+            logger.info(f"Fertilizer classes: {self.data_loader.class_names}")
+        
+        # Load scaler
+        scaler_path = self.model_dir / "scaler.pkl"
+        if scaler_path.exists():
+            self.data_loader.scaler = joblib.load(scaler_path)
+            logger.info(f"StandardScaler loaded from: {scaler_path}")
+        
+        # Load feature columns
+        feature_cols_path = self.model_dir / "feature_columns.pkl"
+        if feature_cols_path.exists():
+            feature_names = joblib.load(feature_cols_path)
+            self.data_loader.feature_columns = feature_names
+            logger.info(f"Feature columns loaded: {feature_names}")
+        
+        return True
 
 def main():
     """Main function to train model"""
@@ -1,58 +1,190 @@
 import io
+import re
+import asyncio
+import base64
+import hashlib
+import importlib
 import logging
+import threading
 import tempfile
 import os
+import wave
+from types import MappingProxyType
+from functools import cached_property, reduce
+from pathlib import Path
 from typing import Optional, Dict, Any
-import speech_recognition as sr
+import httpx
 from config import config
 
-# Try to import gTTS for text-to-speech
+# HTTP/2 for the TTS client needs the h2 package (httpx[http2])
 try:
-    from gtts import gTTS
-    TTS_AVAILABLE = True
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
 except ImportError:
-    TTS_AVAILABLE = False
-    logging.warning("gTTS not available for text-to-speech")
-
-# Initialize speech recognizer
-recognizer = sr.Recognizer()
+    HTTP2_AVAILABLE = False
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Map language codes to SpeechRecognition codes
+STT_LANG_MAP = MappingProxyType({
+    "en": "en-US",
+    "hi": "hi-IN",
+    "ta": "ta-IN",
+    "te": "te-IN",
+    "bn": "bn-IN",
+    "mr": "mr-IN",
+    "gu": "gu-IN",
+    "kn": "kn-IN",
+    "ml": "ml-IN",
+    "or": "or-IN",
+    "pa": "pa-IN",
+    "ur": "ur-PK"
+})
+
+# Module providing each configurable speech backend; only the selected ones are imported, on first use
+STT_BACKENDS = MappingProxyType({"google": "speech_recognition"})
+TTS_BACKENDS = MappingProxyType({"gtts": "gtts"})
+
+def _load_backend(kind: str, name: str, backends: MappingProxyType) -> Optional[Any]:
+    """Import the module for a configured backend; None if disabled, unknown or not installed"""
+    if name == "none":
+        return None
+    module_name = backends.get(name)
+    if module_name is None:
+        logger.warning(f"Unknown {kind} backend '{name}', {kind} disabled")
+        return None
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        logger.warning(f"{module_name} not available for {kind}")
+        return None
+
+# Clips longer than this are recognized in overlapping chunks, concurrently
+STT_CHUNK_MS = 30_000
+STT_CHUNK_OVERLAP_MS = 1_000
+
+def _merge_overlap(left: str, right: str, max_words: int = 8) -> str:
+    """Join two chunk transcripts, dropping words repeated across the chunk overlap"""
+    left_words = left.split()
+    right_words = right.split()
+    for n in range(min(max_words, len(left_words), len(right_words)), 0, -1):
+        if [w.lower() for w in left_words[-n:]] == [w.lower() for w in right_words[:n]]:
+            right_words = right_words[n:]
+            break
+    return " ".join(left_words + right_words)
+
+# Base64 MP3 payload in Google Translate's batchexecute TTS response (as parsed by gTTS)
+_TTS_AUDIO_RE = re.compile(r'jQ1olc","\[\\"(.*)\\"]')
+
+# Map language codes to gTTS compatible codes
+TTS_LANG_MAP = MappingProxyType({
+    "en": "en",
+    "hi": "hi",
+    "ta": "ta",
+    "te": "te",
+    "bn": "bn",
+    "mr": "mr",
+    "gu": "gu",
+    "kn": "kn",
+    "ml": "ml",
+    "or": "or",
+    "pa": "pa",
+    "ur": "ur"
+})
+
 class VoiceHandler:
     def __init__(self):
-        # No initialization needed for SpeechRecognition
-        pass
+        # Speech backends are imported and created on first use
+        self.stt_backend = config.STT_BACKEND.lower()
+        self.tts_backend = config.TTS_BACKEND.lower()
+        self.tts_cache_dir = Path(config.TTS_CACHE_DIR)
+        self.tts_cache_max_bytes = config.TTS_CACHE_MAX_MB * 1024 * 1024
+    
+    @cached_property
+    def http_client(self) -> httpx.AsyncClient:
+        """Pooled client for Google Translate TTS requests, created on first use"""
+        return httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            timeout=30.0,
+            http2=HTTP2_AVAILABLE
+        )
+    
+    async def aclose(self):
+        """Close the TTS HTTP client if it was created"""
+        client = self.__dict__.get("http_client")
+        if client is not None and not client.is_closed:
+            await client.aclose()
+    
+    @cached_property
+    def sr(self) -> Optional[Any]:
+        """speech_recognition module for the "google" STT backend"""
+        return _load_backend("speech-to-text", self.stt_backend, STT_BACKENDS)
+    
+    @cached_property
+    def gtts(self) -> Optional[Any]:
+        """gtts module for the "gtts" TTS backend"""
+        return _load_backend("text-to-speech", self.tts_backend, TTS_BACKENDS)
+    
+    @cached_property
+    def recognizer(self) -> Any:
+        """Speech recognizer, created on the first speech-to-text request"""
+        return self.sr.Recognizer()
+    
+    def _to_audio_data(self, audio_data: bytes) -> Any:
+        """Wrap uploaded audio as AudioData, reading WAV headers in-process"""
+        sr = self.sr
+        if audio_data[:4] == b"RIFF" and audio_data[8:12] == b"WAVE":
+            with wave.open(io.BytesIO(audio_data), "rb") as wav:
+                if wav.getnchannels() == 1 and wav.getsampwidth() >= 2:
+                    # Signed mono PCM can be used as-is at its real rate and sample width
+                    return sr.AudioData(wav.readframes(wav.getnframes()), wav.getframerate(), wav.getsampwidth())
+            # Multi-channel or unsigned 8-bit WAV: let SpeechRecognition convert it
+            with sr.AudioFile(io.BytesIO(audio_data)) as source:
+                return self.recognizer.record(source)
         
+        # Anything else is treated as raw 16kHz 16-bit mono PCM
+        return sr.AudioData(audio_data, 16000, 2)
+    
+    def _recognize_chunk(self, audio: Any, language: str) -> str:
+        """Recognize one chunk of a long clip; silent or unintelligible chunks give an empty string"""
+        try:
+            return self.recognizer.recognize_google(audio, language=language)
+        except self.sr.UnknownValueError:
+            return ""
     
     async def speech_to_text(self, audio_data: bytes, language: str = "auto") -> Optional[str]:
         """Convert speech to text using SpeechRecognition"""
+        sr = self.sr
+        if sr is None:
+            logger.warning("Speech-to-text is not available (backend disabled or not installed)")
+            return None
+        
         try:
             # Convert to AudioData object
-            audio = sr.AudioData(audio_data, 16000, 2)  # Assuming 16kHz mono audio
-            
-            # Map language codes to SpeechRecognition codes
-            lang_mapping = {
-                "en": "en-US",
-                "hi": "hi-IN",
-                "ta": "ta-IN",
-                "te": "te-IN",
-                "bn": "bn-IN",
-                "mr": "mr-IN",
-                "gu": "gu-IN",
-                "kn": "kn-IN",
-                "ml": "ml-IN",
-                "or": "or-IN",
-                "pa": "pa-IN",
-                "ur": "ur-PK"
-            }
+            audio = await asyncio.to_thread(self._to_audio_data, audio_data)
             
             # Use English as fallback if language not supported
-            recognize_lang = lang_mapping.get(language, "en-US")
+            recognize_lang = STT_LANG_MAP.get(language, "en-US")
             
             # Recognize speech
-            text = recognizer.recognize_google(audio, language=recognize_lang)
+            # Blocking HTTP call to Google; run it off the event loop
+            duration_ms = len(audio.frame_data) * 1000 // (audio.sample_rate * audio.sample_width)
+            if duration_ms <= STT_CHUNK_MS:
+                text = await asyncio.to_thread(self.recognizer.recognize_google, audio, language=recognize_lang)
+            else:
+                step = STT_CHUNK_MS - STT_CHUNK_OVERLAP_MS
+                chunks = [
+                    audio.get_segment(start, start + STT_CHUNK_MS)
+                    for start in range(0, duration_ms - STT_CHUNK_OVERLAP_MS, step)
+                ]
+                logger.info(f"Recognizing {duration_ms / 1000:.1f}s of audio in {len(chunks)} chunks")
+                parts = await asyncio.gather(*(
+                    asyncio.to_thread(self._recognize_chunk, chunk, recognize_lang) for chunk in chunks
+                ))
+                text = reduce(_merge_overlap, (part for part in parts if part), "")
+                if not text:
+                    raise sr.UnknownValueError()
             
             logger.info(f"Speech transcribed: {text[:50]}...")
             return text
@@ -67,46 +199,125 @@ class VoiceHandler:
             logger.error(f"Error in speech-to-text: {e}")
             return None
     
-    async def text_to_speech(self, text: str, language: str = "en") -> Optional[str]:
-        """Convert text to speech using gTTS and return the path to the audio file"""
-        if not TTS_AVAILABLE:
-            logger.warning("Text-to-speech is not available as gTTS is not installed")
+    async def text_to_speech(self, text: str, language: str = "en") -> Optional[bytes]:
+        """Convert text to speech using gTTS and return the MP3 audio bytes"""
+        if self.gtts is None:
+            logger.warning("Text-to-speech is not available (backend disabled or gTTS not installed)")
             return None
         
         try:
-            # Map language codes to gTTS compatible codes
-            lang_mapping = {
-                "en": "en",
-                "hi": "hi",
-                "ta": "ta",
-                "te": "te",
-                "bn": "bn",
-                "mr": "mr",
-                "gu": "gu",
-                "kn": "kn",
-                "ml": "ml",
-                "or": "or",
-                "pa": "pa",
-                "ur": "ur"
-            }
-            
             # Use English as fallback if language not supported
-            tts_lang = lang_mapping.get(language, "en")
-            
-            # Generate speech
-            tts = gTTS(text=text, lang=tts_lang)
+            tts_lang = TTS_LANG_MAP.get(language, "en")
             
-            # Save to temporary file
-            tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-            tts.save(tmp_file.name)
+            # Serve repeated phrases from the cache
+            cache_path = self._tts_cache_path(text, tts_lang)
+            audio = await asyncio.to_thread(self._read_tts_cache, cache_path)
+            if audio is not None:
+                logger.info(f"Text-to-speech served from cache for language {tts_lang}")
+                return audio
             
+            audio = None
+            # The async path relies on gTTS's private request builder; versions
+            # without it use the public write_to_fp path
+            if hasattr(self.gtts.gTTS, "_prepare_requests"):
+                try:
+                    audio = await self._synthesize_async(text, tts_lang)
+                except Exception as e:
+                    logger.warning(f"Async TTS request failed, falling back to gTTS: {e}")
+            if audio is None:
+                # gTTS blocks on HTTP requests; run it off the event loop
+                audio = await asyncio.to_thread(self._synthesize, text, tts_lang)
+            await asyncio.to_thread(self._store_tts_cache, cache_path, audio)
             logger.info(f"Text-to-speech generated successfully for language {tts_lang}")
-            return tmp_file.name
+            return audio
             
         except Exception as e:
             logger.error(f"Error in text-to-speech: {e}")
             return None
     
+    async def _synthesize_async(self, text: str, language: str) -> bytes:
+        """
+        Generate speech with the requests gTTS would send, over the pooled async client
+        gTTS still tokenizes the text and builds the requests; only the HTTP round-trips change
+        """
+        tts = self.gtts.gTTS(text=text, lang=language)
+        audio = bytearray()
+        for prepared in tts._prepare_requests():
+            response = await self.http_client.request(
+                prepared.method, prepared.url, headers=dict(prepared.headers), content=prepared.body
+            )
+            response.raise_for_status()
+            found = False
+            for line in response.text.splitlines():
+                if "jQ1olc" in line:
+                    match = _TTS_AUDIO_RE.search(line)
+                    if not match:
+                        raise ValueError("Unexpected Google TTS response format")
+                    audio += base64.b64decode(match.group(1).encode("ascii"))
+                    found = True
+            if not found:
+                raise ValueError("No audio in Google TTS response")
+        return bytes(audio)
+    
+    def _synthesize(self, text: str, language: str) -> bytes:
+        """Generate speech with gTTS straight into memory"""
+        tts = self.gtts.gTTS(text=text, lang=language)
+        buffer = io.BytesIO()
+        tts.write_to_fp(buffer)
+        return buffer.getvalue()
+    
+    def _tts_cache_path(self, text: str, language: str) -> Path:
+        """Content-addressed cache path for synthesized speech"""
+        key = hashlib.blake2b(f"{language}|{text}".encode("utf-8"), digest_size=16).hexdigest()
+        return self.tts_cache_dir / f"{key}.mp3"
+    
+    def _read_tts_cache(self, cache_path: Path) -> Optional[bytes]:
+        """Cached audio for a cache path, or None on a miss"""
+        try:
+            audio = cache_path.read_bytes()
+            os.utime(cache_path)  # Mark as recently used for eviction
+            return audio
+        except FileNotFoundError:
+            return None
+    
+    def _store_tts_cache(self, cache_path: Path, audio: bytes):
+        """Write synthesized audio into the cache atomically; failures only cost a cache miss"""
+        try:
+            self.tts_cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.tts_cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(audio)
+                os.replace(tmp_path, cache_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self._evict_tts_cache()
+        except Exception as e:
+            logger.warning(f"Error caching text-to-speech audio: {e}")
+    
+    def _evict_tts_cache(self):
+        """Delete least recently used cached audio once the cache exceeds its size limit"""
+        try:
+            entries = []
+            total = 0
+            for path in self.tts_cache_dir.glob("*.mp3"):
+                stat = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            
+            if total <= self.tts_cache_max_bytes:
+                return
+            
+            for _, size, path in sorted(entries):
+                path.unlink(missing_ok=True)
+                total -= size
+                if total <= self.tts_cache_max_bytes:
+                    break
+            logger.info(f"Evicted text-to-speech cache down to {total / (1024 * 1024):.1f} MB")
+        except Exception as e:
+            logger.warning(f"Error evicting text-to-speech cache: {e}")
+    
     def get_supported_languages(self) -> Dict[str, str]:
         """Get list of supported languages for speech-to-text (using Google Speech Recognition)"""
         return {
@@ -124,5 +335,20 @@ class VoiceHandler:
             "ur": "اردو (Urdu)"
         }
 
-# Global voice handler instance
-voice_handler = VoiceHandler()
\ No newline at end of file
+# Global voice handler instance, created on first use
+_voice_handler: Optional[VoiceHandler] = None
+_voice_handler_lock = threading.Lock()
+
+async def close_voice_handler():
+    """Release the voice handler's HTTP connections, if it was ever created"""
+    if _voice_handler is not None:
+        await _voice_handler.aclose()
+
+def get_voice_handler() -> VoiceHandler:
+    """Get the process-wide VoiceHandler, creating it on first call"""
+    global _voice_handler
+    if _voice_handler is None:
+        with _voice_handler_lock:
+            if _voice_handler is None:
+                _voice_handler = VoiceHandler()
+    return _voice_handler
\ No newline at end of file